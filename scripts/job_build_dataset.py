@@ -0,0 +1,208 @@
+"""
+Builds MooreFRCollections as one parquet partition per source.
+
+Every source has a fingerprint of its inputs (local files, or the ETags of a
+dataset saved on S3); only the partitions whose fingerprint changed are
+rebuilt, and only those are uploaded to the Hub. Replaces the chained
+`job_concat_*` scripts, which re-read, rewrote and re-pushed the whole
+dataset for every new source.
+
+    python job_build_dataset.py --push
+"""
+import os
+import json
+import argparse
+from pathlib import Path
+import pandas as pd
+from datasets import load_from_disk
+from dotenv import load_dotenv
+from loguru import logger
+
+from shelpers.dataset_builder import (
+    Source,
+    build_dataset,
+    push_partitions,
+    files_fingerprint,
+    s3_prefix_fingerprint,
+)
+from shelpers.data_parser import clean_verse_column
+from shelpers.hub_delta import HubRepo, LocalRepo
+from shelpers.s3_utils import get_s3_client
+
+load_dotenv()
+
+BUCKET_NAME = "moore-collection"
+REPO_ID = "sawadogosalif/MooreFRCollections"
+OUTPUT_DIR = "datasets/MooreFRCollections"
+
+URS_NIGGLI_PATH = "./Dictionnary Edition Janvier 2017, Compilé par Urs Niggli"
+INDEX_FRANCAIS_MOORE_PATH = "./dictionnary Index Français Moore"
+HUMAN_RIGHTS_PATH = "./declaration droits humains"
+BIBLE_MOORE_DIR = "datasets/bible_data_moore.parquet/"
+BIBLE_FRENCH_DIR = "datasets/bible_data_francais.parquet/"
+SMOL_PREFIX = "hf_datasets/SMOL"
+MASAKHANE_PREFIX = "hf_datasets/masakhane_fr_mos"
+
+# Bump the version of a source when its loading code changes.
+VERSIONS = {
+    "urs_niggli_2017": "1",
+    "index_francais_moore": "1",
+    "human_rights": "1",
+    "bible": "1",
+    "smol": "1",
+    "masakhane": "1",
+}
+
+
+def storage_options():
+    return {
+        "key": os.getenv("AWS_ACCESS_KEY_ID"),
+        "secret": os.getenv("AWS_SECRET_ACCESS_KEY"),
+        "client_kwargs": {"endpoint_url": os.getenv("AWS_ENDPOINT_URL_S3")},
+    }
+
+
+def read_page_jsons(folder, source):
+    """Entries of the per-page extraction JSONs of a dictionary, failed pages skipped."""
+    data = []
+    for jsonpath in Path(folder).glob("*.json"):
+        with open(jsonpath, encoding="utf-8") as f:
+            jsonfile = json.load(f)
+        cleaned_list = [x for x in jsonfile if x is not None]
+        data.append(pd.DataFrame(sum(cleaned_list, [])).assign(source=source))
+    return pd.concat(data).reset_index(drop=True).rename(columns={"français": "french"})
+
+
+def load_urs_niggli():
+    return read_page_jsons(URS_NIGGLI_PATH, "dictionnary-Urs Niggli-Edition Janvier 2017")
+
+
+def load_index_francais_moore():
+    dictionnary = read_page_jsons(INDEX_FRANCAIS_MOORE_PATH, "dictionnary-index Français Moore")
+    dictionnary["moore"] = (
+        dictionnary.reindex(
+            columns=[
+                "explication",
+                "v. itératif.",
+                "Nom.",
+                "Verbe.",
+                "expression.",
+                "auxiliaire.",
+                "Adverbe.",
+                "v. inaccompli.",
+            ]
+        )
+        .fillna("")
+        .astype(str)
+        .agg(" ".join, axis=1)
+        .str.replace(
+            r"(Verbe\.|expression\.|Nom\.|auxiliaire\.|Adverbe\.|Adjectif\.)",
+            "",
+            regex=True,
+        )
+        .str.strip()
+    )
+    return dictionnary
+
+
+def load_human_rights():
+    data = []
+    for jsonpath in Path(HUMAN_RIGHTS_PATH).glob("*.json"):
+        with open(jsonpath, encoding="utf-8") as f:
+            data.append(pd.DataFrame(json.load(f)).assign(source="declaration droits humains"))
+    return pd.concat(data).reset_index(drop=True).rename(columns={"français": "french"})
+
+
+def load_bible():
+    moore = pd.read_parquet(BIBLE_MOORE_DIR)[["verse_id", "verse_text"]]
+    french = pd.read_parquet(BIBLE_FRENCH_DIR)[["verse_id", "verse_text"]]
+    bible = moore.merge(french, on="verse_id", suffixes=("_moore", "_french")).drop_duplicates()
+    return pd.DataFrame(
+        {
+            "moore": clean_verse_column(bible["verse_text_moore"]),
+            "french": clean_verse_column(bible["verse_text_french"]),
+            "source": "bible",
+        }
+    )
+
+
+def load_s3_dataset(prefix):
+    return load_from_disk(
+        f"s3://{BUCKET_NAME}/{prefix}", storage_options=storage_options()
+    ).to_pandas()
+
+
+def get_sources(s3_client):
+    return [
+        Source(
+            "urs_niggli_2017",
+            lambda: files_fingerprint(
+                f"{URS_NIGGLI_PATH}/*.json", version=VERSIONS["urs_niggli_2017"]
+            ),
+            load_urs_niggli,
+        ),
+        Source(
+            "index_francais_moore",
+            lambda: files_fingerprint(
+                f"{INDEX_FRANCAIS_MOORE_PATH}/*.json", version=VERSIONS["index_francais_moore"]
+            ),
+            load_index_francais_moore,
+        ),
+        Source(
+            "human_rights",
+            lambda: files_fingerprint(
+                f"{HUMAN_RIGHTS_PATH}/*.json", version=VERSIONS["human_rights"]
+            ),
+            load_human_rights,
+        ),
+        Source(
+            "bible",
+            lambda: files_fingerprint(
+                f"{BIBLE_MOORE_DIR}**/*.parquet",
+                f"{BIBLE_FRENCH_DIR}**/*.parquet",
+                version=VERSIONS["bible"],
+            ),
+            load_bible,
+        ),
+        Source(
+            "smol",
+            lambda: s3_prefix_fingerprint(
+                s3_client, BUCKET_NAME, SMOL_PREFIX, version=VERSIONS["smol"]
+            ),
+            lambda: load_s3_dataset(SMOL_PREFIX),
+        ),
+        Source(
+            "masakhane",
+            lambda: s3_prefix_fingerprint(
+                s3_client, BUCKET_NAME, MASAKHANE_PREFIX, version=VERSIONS["masakhane"]
+            ),
+            lambda: load_s3_dataset(MASAKHANE_PREFIX),
+        ),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build MooreFRCollections incrementally.")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help="Folder of the partitions")
+    parser.add_argument("--force", action="store_true", help="Rebuild every partition")
+    parser.add_argument("--push", action="store_true", help="Upload the changed partitions")
+    parser.add_argument("--repo-id", default=REPO_ID, help="Hub dataset repository")
+    parser.add_argument(
+        "--local-repo", default=None, help="Local folder used instead of the Hub repository"
+    )
+    args = parser.parse_args()
+
+    rebuilt, removed = build_dataset(get_sources(get_s3_client()), args.output_dir, args.force)
+    logger.info(f"Rebuilt partitions: {rebuilt or 'none'}, removed: {removed or 'none'}")
+
+    if args.push:
+        repo = (
+            LocalRepo(args.local_repo)
+            if args.local_repo
+            else HubRepo(args.repo_id, token=os.getenv("HF_TOKEN"))
+        )
+        push_partitions(args.output_dir, repo)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,14 @@
-from pdf2image import convert_from_path
+from shelpers.pdf_utils import rasterise_pdf
 
 pdf_path = "./Dictionnary Edition Janvier 2017, Compilé par Urs Niggli/Dictionnaire.pdf"
 output_folder = "./Dictionnary Edition Janvier 2017, Compilé par Urs Niggli/images"
 print("start")
-images = convert_from_path(pdf_path, dpi=300, output_folder=output_folder, fmt="jpeg")
-for i, image in enumerate(images):
-    print(i)
-    image.save(f"{output_folder}/page_{i + 1}.jpg", "JPEG")
-    print(f"Page {i + 1} sauvegardée comme image.")
+# Pages are rendered by parallel pdftoppm processes straight to
+# page_<n>.jpg; pages already rendered by a previous run are kept.
+pages = rasterise_pdf(
+    pdf_path,
+    output_folder,
+    dpi=300,
+    on_page=lambda path: print(f"{path} sauvegardée comme image."),
+)
+print(f"{len(pages)} pages sauvegardées comme images.")
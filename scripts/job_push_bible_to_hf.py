@@ -3,7 +3,7 @@ import pandas as pd
 from datasets import Dataset
 
 
-from jwsoup.text.utils import clean_text
+from shelpers.data_parser import clean_verse_column
 
 
 def list_parquet_files(directory):
@@ -58,7 +58,7 @@ def process_dataset(directory, prefix):
     df = read_parquet_files(parquet_files)
 
     if df is not None:
-        df["verse_text"] = df["verse_text"].apply(clean_text)
+        df["verse_text"] = clean_verse_column(df["verse_text"])
         return df.add_prefix(prefix)
     else:
         return pd.DataFrame()
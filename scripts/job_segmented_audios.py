@@ -1,37 +1,77 @@
 import os
-from pathlib import Path
-import boto3
+import json
+import queue
+import random
+import argparse
+import threading
+import multiprocessing
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pydub import AudioSegment, silence
 from loguru import logger
 from dotenv import load_dotenv
 
+from shelpers.s3_utils import (
+    get_s3_client,
+    download_file_from_s3,
+    upload_many,
+)
+from shelpers.s3_manifest import list_s3_objects
+from shelpers.segmentation_manifest import (
+    SegmentationManifest,
+    delete_s3_keys,
+    DONE,
+    FAILED,
+)
+from shelpers.global_vars import SEGMENTATION_MANIFEST_PATH, SILENCE_PARAMS_PATH
+from shelpers.audio_utils import (
+    energy_envelope,
+    detect_silence,
+    export_segments,
+    sweep_segment_counts,
+)
+from shelpers.data_parser import parse_audio_identifiers
+from shelpers.path_collectors import (
+    parse_source_key,
+    INTRO_SEGMENT_NAMES,
+    INTRO_SEGMENTS_SKIPPED,
+)
+from shelpers.pipeline import StageMetrics, Timer
+
 load_dotenv()
 
-# Configuration - environnement S3
-access_key = os.getenv("AWS_ACCESS_KEY_ID")
-secret_key = os.getenv("AWS_SECRET_ACCESS_KEY")
-endpoint_url = os.getenv("AWS_ENDPOINT_URL_S3")
-
-# Initialize S3 client
-s3_client = boto3.client(
-    "s3",
-    aws_access_key_id=access_key,
-    aws_secret_access_key=secret_key,
-    endpoint_url=endpoint_url,
-)
+DATA_FILE = "sawadogosalif/MooreFRCollections_BibleOnlyText"
+DEFAULT_SEGMENTATION_PARAMS = {"min_silence_len": 400, "silence_thresh": -35}
+# Worker processes start from a fresh interpreter instead of forking the
+# parent, whose download threads, boto3 pools and loguru may hold locks.
+PROCESS_CONTEXT = multiprocessing.get_context("forkserver")
+# Grid swept by --tune.
+TUNING_MIN_SILENCE_LENS = range(200, 1001, 100)
+TUNING_SILENCE_THRESHS = range(-50, -19, 3)
+
 
-# Utility Functions
+def load_segmentation_params(path=SILENCE_PARAMS_PATH):
+    """Parameters picked by the last --tune run, or the defaults."""
+    if not os.path.exists(path):
+        return dict(DEFAULT_SEGMENTATION_PARAMS)
+    with open(path, encoding="utf-8") as f:
+        tuned = json.load(f)
+    return {key: tuned[key] for key in DEFAULT_SEGMENTATION_PARAMS}
 
 
-def download_file_from_s3(bucket_name, s3_key, local_path):
-    """Download a single file from S3."""
-    os.makedirs(os.path.dirname(local_path), exist_ok=True)
-    s3_client.download_file(bucket_name, s3_key, local_path)
-    logger.info(f"Downloaded {s3_key} to {local_path}")
+# Segmentation parameters, recorded in the manifest: changing them
+# re-segments every source on the next run.
+SEGMENTATION_PARAMS = load_segmentation_params()
 
 
 def process_audio_with_silence_detection(
-    file_path, segment_folder, min_silence_len=400, silence_thresh=-35
+    file_path,
+    segment_folder,
+    min_silence_len=400,
+    silence_thresh=-35,
+    detector="numpy",
+    exporter="ffmpeg",
+    variants=(),
 ):
     """
     Process an audio file to split it into segments based on detected silences.
@@ -41,17 +81,39 @@ def process_audio_with_silence_detection(
         segment_folder (str): Folder to save the segmented audio files.
         min_silence_len (int): Minimum length of silence (in ms) to consider a split.
         silence_thresh (int): Silence threshold in dBFS.
+        detector (str): "numpy" for the vectorised detector on the PCM array,
+            "pydub" for `pydub.silence.detect_silence` (same boundaries, much slower).
+        exporter (str): "ffmpeg" to encode every segment through one ffmpeg
+            process fed from the decoded PCM, "pydub" for one export per segment.
+        variants (tuple): Extra formats written next to the mp3 ("opus", "flac"),
+            only with the ffmpeg exporter.
 
     Returns:
-        list: List of paths to the segmented audio files.
+        list: List of paths to the segmented audio files (mp3 first, then variants).
     """
     audio = AudioSegment.from_file(file_path)
 
-    silences = silence.detect_silence(
-        audio, min_silence_len=min_silence_len, silence_thresh=silence_thresh
-    )
+    if detector == "numpy":
+        silences = detect_silence(
+            energy_envelope(audio),
+            min_silence_len=min_silence_len,
+            silence_thresh=silence_thresh,
+        )
+    else:
+        silences = silence.detect_silence(
+            audio, min_silence_len=min_silence_len, silence_thresh=silence_thresh
+        )
     silences = [(start, end) for start, end in silences]
 
+    if exporter == "ffmpeg":
+        ranges, start = [], 0
+        for silence_start, silence_end in silences:
+            ranges.append((start, silence_start))
+            start = silence_end
+        paths = export_segments(audio, ranges, segment_folder, ("mp3", *variants))
+        logger.info(f"{len(ranges)} segments saved in {segment_folder}")
+        return [path for fmt in ("mp3", *variants) for path in paths[fmt]]
+
     start, segments = 0, []
     for i, (silence_start, silence_end) in enumerate(silences):
         segment = audio[start:silence_start]
@@ -63,61 +125,465 @@ def process_audio_with_silence_detection(
     return segments
 
 
-def upload_file_to_s3(local_path, bucket_name, s3_key):
-    """Upload a single file to S3."""
-    s3_client.upload_file(local_path, bucket_name, s3_key)
-    logger.info(f"Uploaded {local_path} to s3://{bucket_name}/{s3_key}")
+def local_paths(s3_key, destination_folder, local_download_folder):
+    """Local download path and segment folder of a source file."""
+    suffix = s3_key.split("/")[-1].replace("\\", "/")
+    local_file_path = f"{local_download_folder}/{suffix}"
+    segment_name = local_file_path.split(f"{local_download_folder}/")[-1].replace(".mp3", "")
+    return local_file_path, f"{destination_folder}/{segment_name}/"
+
+
+def download_source(s3_client, bucket_name, s3_key, local_file_path):
+    """Download stage (thread). Returns (bytes, seconds)."""
+    with Timer() as timer:
+        download_file_from_s3(s3_client, bucket_name, s3_key, local_file_path)
+    return os.path.getsize(local_file_path), timer.elapsed
+
+
+def segment_source(local_file_path, segment_subfolder, params):
+    """Segmentation stage (worker process). The source file is removed once segmented."""
+    with Timer() as timer:
+        os.makedirs(os.path.dirname(segment_subfolder), exist_ok=True)
+        try:
+            segments = process_audio_with_silence_detection(
+                local_file_path, segment_subfolder, **params
+            )
+        finally:
+            os.remove(local_file_path)
+    return segments, timer.elapsed
+
+
+def upload_segments(s3_client, bucket_name, segments, max_workers=8):
+    """Upload stage (thread). Uploaded segments are removed from the disk."""
+    with Timer() as timer:
+        results = list(
+            upload_many(
+                s3_client,
+                bucket_name,
+                ((segment_path, segment_path) for segment_path in segments),
+                max_workers=max_workers,
+            )
+        )
+    for result in results:
+        if result.ok:
+            os.remove(result.local_path)
+    failed = [result.s3_key for result in results if not result.ok]
+    return failed, sum(result.nbytes for result in results), timer.elapsed
+
+
+def run_pipeline(
+    files,
+    s3_client,
+    bucket_name,
+    destination_folder,
+    local_download_folder,
+    download_workers=4,
+    segment_workers=None,
+    upload_workers=4,
+    queue_size=8,
+    params=SEGMENTATION_PARAMS,
+    on_result=None,
+):
+    """
+    Download -> segment -> upload pipeline with bounded stages.
+
+    Downloads run in a thread pool, segmentation in a process pool (one file
+    per core) and uploads in a thread pool, so the network and the CPUs are
+    busy at the same time. Each hand-off holds at most `queue_size` files:
+    a slow stage blocks the previous ones instead of filling the disk.
+
+    `s3_client` is only used by the download and upload threads of this
+    process; the segmentation processes never touch S3.
+
+    `on_result(s3_key, segment_keys, error)` is called once per source file,
+    with `error` None when all its segments were uploaded.
+
+    Returns:
+        dict: StageMetrics of the "download", "segment" and "upload" stages.
+    """
+    metrics = {name: StageMetrics(name) for name in ("download", "segment", "upload")}
+    downloaded = queue.Queue(maxsize=queue_size)
+    segmented = queue.Queue(maxsize=queue_size)
+    upload_slots = threading.BoundedSemaphore(queue_size)
+    done = object()
+    # Exceptions that killed a feeder thread, re-raised in the calling thread.
+    feeder_errors = []
+
+    def report(s3_key, segment_keys, error=None):
+        if on_result is not None:
+            on_result(s3_key, segment_keys, error)
+
+    with ThreadPoolExecutor(download_workers) as downloads, ProcessPoolExecutor(
+        segment_workers, mp_context=PROCESS_CONTEXT
+    ) as segmenters, ThreadPoolExecutor(upload_workers) as uploads:
+
+        def feed_downloads():
+            try:
+                for s3_key in files:
+                    if feeder_errors:
+                        break
+                    local_file_path, segment_subfolder = local_paths(
+                        s3_key, destination_folder, local_download_folder
+                    )
+                    future = downloads.submit(
+                        download_source, s3_client, bucket_name, s3_key, local_file_path
+                    )
+                    downloaded.put((s3_key, local_file_path, segment_subfolder, future))
+            except BaseException as e:
+                feeder_errors.append(e)
+            finally:
+                downloaded.put(done)
+
+        def discard_download(s3_key, local_file_path, segment_subfolder, future):
+            try:
+                future.result()
+            except Exception:
+                return
+            if os.path.exists(local_file_path):
+                os.remove(local_file_path)
+            logger.warning(f"{s3_key} abandoned after a pipeline error")
+
+        def feed_segmentation():
+            try:
+                while (item := downloaded.get()) is not done:
+                    s3_key, local_file_path, segment_subfolder, future = item
+                    try:
+                        nbytes, latency = future.result()
+                        metrics["download"].record(latency, nbytes=nbytes)
+                    except Exception as e:
+                        metrics["download"].record(0, ok=False)
+                        logger.warning(f"download of {s3_key} failed: {e}")
+                        report(s3_key, [], f"download: {e}")
+                        continue
+                    future = segmenters.submit(
+                        segment_source, local_file_path, segment_subfolder, params
+                    )
+                    # The segmentation process now owns (and removes) the source.
+                    item = None
+                    segmented.put((s3_key, future))
+            except BaseException as e:
+                feeder_errors.append(e)
+                # Unblock the download feeder, which then stops at its next
+                # file, and delete the sources that will not be segmented.
+                while item is not done:
+                    if item is not None:
+                        discard_download(*item)
+                    item = downloaded.get()
+            finally:
+                segmented.put(done)
+
+        def on_uploaded(s3_key, segments, future):
+            upload_slots.release()
+            # The futures machinery swallows what a done-callback raises (e.g.
+            # a manifest that cannot be written): log it instead.
+            try:
+                record_upload(s3_key, segments, future)
+            except Exception:
+                logger.exception(f"Recording the upload of {s3_key} failed")
+
+        def record_upload(s3_key, segments, future):
+            try:
+                failed, nbytes, latency = future.result()
+            except Exception as e:
+                metrics["upload"].record(0, ok=False)
+                logger.warning(f"upload of the segments of {s3_key} failed: {e}")
+                report(s3_key, segments, f"upload: {e}")
+                return
+            metrics["upload"].record(latency, ok=not failed, nbytes=nbytes)
+            if failed:
+                logger.warning(f"{len(failed)} segments of {s3_key} failed to upload")
+                report(s3_key, segments, f"upload: {len(failed)} segments failed")
+            else:
+                logger.info(f"Completed processing for {s3_key}")
+                report(s3_key, segments)
+
+        feeders = [
+            threading.Thread(target=feed_downloads, daemon=True),
+            threading.Thread(target=feed_segmentation, daemon=True),
+        ]
+        for feeder in feeders:
+            feeder.start()
 
+        processed = 0
+        while (item := segmented.get()) is not done:
+            s3_key, future = item
+            try:
+                segments, latency = future.result()
+                metrics["segment"].record(latency)
+            except Exception as e:
+                metrics["segment"].record(0, ok=False)
+                logger.warning(f"processing of {s3_key} failed: {e}")
+                report(s3_key, [], f"segmentation: {e}")
+                continue
 
-def list_s3_files(bucket_name, prefix):
-    """List all files in an S3 bucket under a given prefix."""
-    paginator = s3_client.get_paginator("list_objects_v2")
-    files = []
-    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
-        for obj in page.get("Contents", []):
-            files.append(obj["Key"])
-    return files
+            upload_slots.acquire()
+            uploads.submit(upload_segments, s3_client, bucket_name, segments).add_done_callback(
+                lambda future, s3_key=s3_key, segments=segments: on_uploaded(
+                    s3_key, segments, future
+                )
+            )
+            processed += 1
+            if processed % 10 == 0:
+                for stage in metrics.values():
+                    logger.info(stage.summary())
+
+        for feeder in feeders:
+            feeder.join()
+
+    for stage in metrics.values():
+        logger.info(stage.summary())
+    if feeder_errors:
+        raise feeder_errors[0]
+    return metrics
+
+
+def sweep_source(local_file_path, min_silence_lens, silence_threshs):
+    """Tuning worker: decodes a source once and counts its segments over the whole grid."""
+    try:
+        audio = AudioSegment.from_file(local_file_path)
+        return sweep_segment_counts(energy_envelope(audio), min_silence_lens, silence_threshs)
+    finally:
+        os.remove(local_file_path)
+
+
+def load_verse_counts():
+    """Returns {(chapter, page): number of verses} from the Bible text dataset."""
+    from datasets import load_dataset
+
+    data = load_dataset(DATA_FILE, split="train").to_pandas()
+    pages = parse_audio_identifiers(data["moore_source_url"])
+    return Counter(zip(pages["chapter"], pages["page"].tolist()))
+
+
+def tune(
+    s3_client,
+    source_folder,
+    bucket_name,
+    local_download_folder,
+    sample_size=30,
+    download_workers=4,
+    segment_workers=None,
+    seed=0,
+):
+    """
+    Picks the silence parameters whose segment counts best match the verse counts.
+
+    A page audio should give one segment per verse, plus the introduction
+    segments that `get_page_segments` drops. A sample of pages is decoded
+    once each, the segment count of every grid combination is read from the
+    energy envelope, and the combination with the lowest mean absolute error
+    over the sample is saved to SILENCE_PARAMS_PATH, where the next
+    segmentation run picks it up.
+
+    Returns:
+        dict: The tuned parameters with their error on the sample.
+    """
+    verse_counts = load_verse_counts()
+    objects, _ = list_s3_objects(s3_client, bucket_name, source_folder)
+    sources = [
+        (obj["key"], verse_counts[parsed])
+        for obj in objects
+        if (parsed := parse_source_key(obj["key"])) in verse_counts
+    ]
+    logger.info(f"{len(sources)} page audios have a known verse count")
+    sources = random.Random(seed).sample(sources, min(sample_size, len(sources)))
+    intro = INTRO_SEGMENT_NAMES + INTRO_SEGMENTS_SKIPPED
+
+    errors, exact = defaultdict(int), defaultdict(int)
+    with ThreadPoolExecutor(download_workers) as downloads, ProcessPoolExecutor(
+        segment_workers, mp_context=PROCESS_CONTEXT
+    ) as sweepers:
+        downloaded = {
+            downloads.submit(
+                download_source,
+                s3_client,
+                bucket_name,
+                s3_key,
+                local_paths(s3_key, "", local_download_folder)[0],
+            ): (s3_key, verses)
+            for s3_key, verses in sources
+        }
+        sweeps = {}
+        for future in as_completed(downloaded):
+            s3_key, verses = downloaded[future]
+            try:
+                future.result()
+            except Exception as e:
+                logger.warning(f"download of {s3_key} failed: {e}")
+                continue
+            local_file_path = local_paths(s3_key, "", local_download_folder)[0]
+            sweeps[
+                sweepers.submit(
+                    sweep_source, local_file_path, TUNING_MIN_SILENCE_LENS, TUNING_SILENCE_THRESHS
+                )
+            ] = (s3_key, verses)
+
+        tuned_sources = 0
+        for future in as_completed(sweeps):
+            s3_key, verses = sweeps[future]
+            try:
+                counts = future.result()
+            except Exception as e:
+                logger.warning(f"sweep of {s3_key} failed: {e}")
+                continue
+            tuned_sources += 1
+            for params, count in counts.items():
+                errors[params] += abs(count - (verses + intro))
+                exact[params] += count == verses + intro
 
+    if not tuned_sources:
+        raise RuntimeError("No page audio could be swept")
 
-def main():
+    current = (SEGMENTATION_PARAMS["min_silence_len"], SEGMENTATION_PARAMS["silence_thresh"])
+    best = min(errors, key=errors.get)
+    for label, params in (("current", current), ("best", best)):
+        if params in errors:
+            logger.info(
+                f"{label} min_silence_len={params[0]} silence_thresh={params[1]}: "
+                f"{errors[params] / tuned_sources:.2f} segments off per page, "
+                f"{exact[params]}/{tuned_sources} pages exact"
+            )
+
+    tuned = {
+        "min_silence_len": best[0],
+        "silence_thresh": best[1],
+        "mean_abs_error": errors[best] / tuned_sources,
+        "exact_pages": exact[best],
+        "pages": tuned_sources,
+    }
+    os.makedirs(os.path.dirname(SILENCE_PARAMS_PATH) or ".", exist_ok=True)
+    with open(SILENCE_PARAMS_PATH, "w", encoding="utf-8") as f:
+        json.dump(tuned, f, indent=2)
+    logger.info(f"Tuned parameters saved to {SILENCE_PARAMS_PATH}")
+    return tuned
+
+
+def main(
+    download_workers=4,
+    segment_workers=None,
+    upload_workers=4,
+    retries=1,
+    force=False,
+    tune_sample=None,
+):
 
     # Configuration
     bucket_name = "moore-collection"
     source_folder = "raw_data/Ebre-rãmbã"
     destination_folder = "fasoai-segmented_audios"
     local_download_folder = "downloaded_audio"
+    s3_client = get_s3_client()
 
-    files = list_s3_files(bucket_name, source_folder)#[137:]  # start from when it failed
+    if tune_sample:
+        tune(
+            s3_client,
+            source_folder,
+            bucket_name,
+            local_download_folder,
+            sample_size=tune_sample,
+            download_workers=download_workers,
+            segment_workers=segment_workers,
+        )
+        return
 
-    # Process each file
-    for s3_key in files:
-        # Skip folders
-        if s3_key.endswith("/"):
-            continue
+    manifest = SegmentationManifest.load(
+        SEGMENTATION_MANIFEST_PATH, s3_client, bucket_name, SEGMENTATION_MANIFEST_PATH
+    )
+    objects, _ = list_s3_objects(s3_client, bucket_name, source_folder)
+    # Skip folders
+    objects = [obj for obj in objects if not obj["key"].endswith("/")]
+    etags = {obj["key"]: obj["etag"] for obj in objects}
 
-        logger.info(f"Processing file: {s3_key}")
-        try:
-            # 1. Download the file
-            suffix = s3_key.split("/")[-1].replace("\\", "/")
-            local_file_path = f"{local_download_folder}/{suffix}"
-            download_file_from_s3(bucket_name, s3_key, local_file_path)
-
-            # 2. Process  file
-            segment_subfolder = f"{destination_folder}/{local_file_path.split("downloaded_audio/")[-1].replace('.mp3', '')}/"
-            os.makedirs(os.path.dirname(segment_subfolder), exist_ok=True)
-            processed_segments = process_audio_with_silence_detection(
-                local_file_path, segment_subfolder
-            )
+    if force:
+        pending, skipped = list(etags), 0
+        logger.info(f"Forced run: {len(pending)} sources to segment")
+    else:
+        pending, reasons, skipped = manifest.plan(objects, SEGMENTATION_PARAMS)
+        logger.info(
+            f"{len(pending)} sources to segment ({dict(reasons)}), "
+            f"{skipped} unchanged sources skipped"
+        )
+
+    def on_result(s3_key, segment_keys, error):
+        # Segments of a previous run that this one did not produce again.
+        stale = set(manifest.segment_keys(s3_key)) - set(segment_keys) if error is None else ()
+        manifest.record(
+            s3_key,
+            etags[s3_key],
+            SEGMENTATION_PARAMS,
+            segment_keys,
+            FAILED if error else DONE,
+            error,
+        )
+        if stale:
+            logger.info(f"Deleting {len(stale)} stale segments of {s3_key}")
+            delete_s3_keys(s3_client, bucket_name, stale)
 
-            # 3. Upload  processed segments
-            for segment_path in processed_segments:
-                upload_file_to_s3(segment_path, bucket_name, segment_path)
+    def failed(s3_key):
+        # A key without entry never reached `on_result`: it failed too.
+        return manifest.entries.get(s3_key, {}).get("status") != DONE
 
-            logger.info(f"Completed processing for {s3_key}")
+    try:
+        for attempt in range(retries + 1):
+            if not pending:
+                break
+            if attempt:
+                logger.info(f"Retrying {len(pending)} failed sources (attempt {attempt + 1})")
+            run_pipeline(
+                pending,
+                s3_client,
+                bucket_name,
+                destination_folder,
+                local_download_folder,
+                download_workers=download_workers,
+                segment_workers=segment_workers,
+                upload_workers=upload_workers,
+                on_result=on_result,
+            )
+            pending = [key for key in pending if failed(key)]
+    finally:
+        # Keep the progress of the sources that did finish, even on a crash.
+        manifest.save(s3_client, bucket_name, SEGMENTATION_MANIFEST_PATH)
 
-        except:
-            logger.warning(f"processing of {s3_key} failed")
+    for s3_key in pending:
+        error = manifest.entries.get(s3_key, {}).get("error") or "not processed"
+        logger.error(f"{s3_key} failed: {error}")
+    logger.info(
+        f"Segmentation manifest: {dict(manifest.statuses())}, "
+        f"{skipped} skipped, {len(pending)} still failing"
+    )
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Split the Bible audios on silences.")
+    parser.add_argument(
+        "--download-workers", type=int, default=4, help="Concurrent source downloads"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Segmentation processes (default: all cores)"
+    )
+    parser.add_argument(
+        "--upload-workers", type=int, default=4, help="Files whose segments upload concurrently"
+    )
+    parser.add_argument(
+        "--retries", type=int, default=1, help="Extra passes over the sources that failed"
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="Segment every source, ignoring the manifest"
+    )
+    parser.add_argument(
+        "--tune",
+        type=int,
+        metavar="PAGES",
+        default=None,
+        help="Tune the silence parameters on a sample of PAGES page audios instead of segmenting",
+    )
+    args = parser.parse_args()
+    main(
+        args.download_workers,
+        args.workers,
+        args.upload_workers,
+        args.retries,
+        args.force,
+        args.tune,
+    )
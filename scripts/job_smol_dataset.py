@@ -11,7 +11,6 @@ and the GATITOS Paper:
 https://arxiv.org/abs/2303.15265
 """
 import os
-import re
 import boto3
 import pandas as pd
 from datasets import load_dataset
@@ -19,39 +18,13 @@ from loguru import logger
 from dotenv import load_dotenv
 from openai import OpenAI
 from datasets import Dataset
-def translate_to_west_african_french(query):
-    """Translates English text to Western African French using OpenAI's GPT mode """
-    
-  
-    client = OpenAI()
-    
-    system_prompt = """Tu es un traducteur de texte en anglas en français d'afrique occidentale.
-    Tu dois juste donner la traduction. La réponse doit être entre la balise <text>.
-    
-    <example>
-    User query: Hello
-    Your answer: <text>Salut</text>
-    User query: a
-    Your answer : un
-    </example>
-    """
-    
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": query}
-        ],
-        temperature=1,
-        top_p=1
-    )
-    
-    output = response.choices[0].message.content
-    
-    translation_match = re.search(r'<text>(.*?)</text>', output, re.DOTALL)
-    if translation_match:
-        return translation_match.group(1).strip()
-    return query
+
+from shelpers.llm_cache import ResponseCache
+from shelpers.translation import translate_texts
+from shelpers.global_vars import TRANSLATION_CACHE_DIR
+
+load_dotenv()
+
 
 def process_gatitos():
     """
@@ -112,7 +85,13 @@ def main():
     logger.info(f"SmolSent length: {len(smolsent_df)}")
 
     combined_df = pd.concat([gatitos_df, smolsent_df, smoldoc_df]).assign(source="google/smol")
-    combined_df["french"] = combined_df["src"].apply(translate_to_west_african_french)
+    # One shared client; repeated sources are translated once, many per request.
+    combined_df["french"] = translate_texts(
+        combined_df["src"].tolist(),
+        OpenAI(),
+        model="gpt-4o-mini",
+        cache=ResponseCache(TRANSLATION_CACHE_DIR),
+    )
 
     dataset = Dataset.from_pandas(combined_df).remove_columns("__index_level_0__")
     dataset.save_to_disk(f"s3://{BUCKET_NAME}/{OUTPUT_PATH}",
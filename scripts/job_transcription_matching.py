@@ -1,126 +1,201 @@
-import boto3
 import os
-from joblib import Parallel, delayed, parallel_backend
-from functools import partial
-import pandas as pd
+import asyncio
+import argparse
+from joblib.externals.loky import get_reusable_executor
 from datasets import load_dataset
 from loguru import logger
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 
 # Import helpers
-from shelpers.data_parser import extract_audio_identifier
-from shelpers.llm_utils import process_single_page
-from shelpers.s3_utils import list_s3_files
+from shelpers.data_parser import page_candidates
+from shelpers.page_index import KEYS, PageStore, load_page_index
+from shelpers.s3_manifest import load_s3_manifest
+from shelpers.s3_utils import get_s3_client
+from shelpers.async_pipeline import run_matching
+from shelpers.batch_pipeline import process_pages_batch
+from shelpers.matching_worker import get_response_cache, init_worker, process_page
 from shelpers.global_vars import (
     BUCKET_NAME,
     SOURCE_FOLDER,
     SYSTEM_PROMPT,
     MODEL_NAME,
     BATCH_SIZE,
+    MANIFEST_PATH,
+    PAGE_INDEX_PATH,
+    PAGE_STORE_PATH,
+    MANIFEST_TTL,
+    PREFETCH_SEGMENTS,
+    PREFILTER_WORKERS,
+    MAX_CONCURRENCY,
+    REQUESTS_PER_MINUTE,
+    TOKENS_PER_MINUTE,
+    JOURNAL_DIR,
+    BATCH_WORK_DIR,
 )
 
 from dotenv import load_dotenv
 
 load_dotenv("vars.env")
 
-# Load dataset and proces
 DATA_FILE = "sawadogosalif/MooreFRCollections_BibleOnlyText"
-data = load_dataset(DATA_FILE, split="train").to_pandas()
-data[["chapter", "page"]] = data["moore_source_url"].apply(
-    lambda x: pd.Series(extract_audio_identifier(x))
-)
-
-# Clients configuration
-access_key = os.getenv("AWS_ACCESS_KEY_ID")
-secret_key = os.getenv("AWS_SECRET_ACCESS_KEY")
-endpoint_url = os.getenv("AWS_ENDPOINT_URL_S3")
 
-s3_client = boto3.client(
-    "s3",
-    aws_access_key_id=access_key,
-    aws_secret_access_key=secret_key,
-    endpoint_url=endpoint_url,
-)
 
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+def load_inputs(s3_client):
+    """
+    Loads the page index of the Bible text and the SegmentIndex of every chapter.
 
-# Collecting paths
-logger.info("Collecting paths")
-files = list_s3_files(s3_client, BUCKET_NAME, SOURCE_FOLDER)
-segment_chapters = list(set([file.split("/")[1] for file in files]))
+    Only called by the parent process: the loky workers read what they need
+    from the page store (see `init_worker`).
+    """
+    page_index = load_page_index(load_dataset(DATA_FILE, split="train"), PAGE_INDEX_PATH)
 
-segment_path_dict = {
-    segment_chapter: list_s3_files(
-        s3_client, BUCKET_NAME, f"{SOURCE_FOLDER}/{segment_chapter}"
+    logger.info("Collecting paths")
+    manifest = load_s3_manifest(
+        s3_client, BUCKET_NAME, SOURCE_FOLDER, cache_path=MANIFEST_PATH, ttl=MANIFEST_TTL
     )
-    for segment_chapter in segment_chapters
-}
-logger.info("Segments and paths are ready.")
-
-
-# Processing a single page 
-def process_page(
-    page_num, tmp, files, BUCKET_NAME, MODEL_NAME, SYSTEM_PROMPT, BATCH_SIZE
-):
-    try:
-        tmp_page = tmp[tmp.page == page_num].reset_index(drop=True)
-        logger.info(f"Processing page {page_num}")
-
-        # Reinitialize clients inside the subprocess
-        s3_client = boto3.client(
-            "s3",
-            aws_access_key_id=access_key,
-            aws_secret_access_key=secret_key,
-            endpoint_url=endpoint_url,
-        )
-        openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-        # Process page
-        result = process_single_page(
+    segment_path_dict = {
+        chapter: manifest.segment_index(chapter) for chapter in manifest.chapters()
+    }
+    logger.info("Segments and paths are ready.")
+    return page_index, segment_path_dict
+
+
+def chapter_page_candidates(page_index):
+    """{chapter: {page_num: candidates}} of every page, computed once for the whole dataset."""
+    by_chapter = {}
+    for (chapter, page_num), candidates in page_candidates(page_index.data, KEYS).items():
+        by_chapter.setdefault(chapter, {})[page_num] = candidates
+    return by_chapter
+
+
+def write_page_store(segment_path_dict, page_index, path=PAGE_STORE_PATH):
+    """Writes the candidates and segments of every page to the store read by the workers."""
+    candidates = chapter_page_candidates(page_index)
+    PageStore.write(
+        path,
+        (
+            (chapter, page_num, page_candidates, files.page_segments(page_num))
+            for chapter, files in segment_path_dict.items()
+            for page_num, page_candidates in candidates.get(chapter, {}).items()
+        ),
+    )
+    return PageStore.open(path).keys()
+
+
+def main(segment_path_dict, page_index, BUCKET_NAME, MODEL_NAME, SYSTEM_PROMPT, prefilter_model=None):
+    pages = write_page_store(segment_path_dict, page_index)
+
+    # Tasks only carry their (chapter, page) key: the pages' data is read from
+    # the store each worker memory-maps once.
+    # Every worker holds its own Whisper model: with the prefilter, fewer
+    # workers keep the memory and the torch threads within the machine.
+    max_workers = os.cpu_count()
+    if prefilter_model:
+        max_workers = min(max_workers, PREFILTER_WORKERS)
+    logger.info(f"Starting parallel processing of {len(pages)} pages on {max_workers} workers")
+    executor = get_reusable_executor(
+        max_workers=max_workers,
+        initializer=init_worker,
+        initargs=(PAGE_STORE_PATH, prefilter_model),
+    )
+    futures = [
+        executor.submit(
+            process_page,
+            chapter,
             page_num,
-            tmp_page,
-            files,
-            openai_client,
-            s3_client,
             BUCKET_NAME,
             MODEL_NAME,
             SYSTEM_PROMPT,
             BATCH_SIZE,
+            prefilter_model,
         )
-        print(f"Page {page_num} processed successfully.")
-        return result
-    except Exception as e:
-        logger.error(f"Error processing page {page_num}: {e}")
-        return None
-
-
-def main(segment_path_dict, data, BUCKET_NAME, MODEL_NAME, SYSTEM_PROMPT):
-    tasks = []
-
-    segment_paths = segment_path_dict.items()
-
-    for chapter, files in segment_paths:
-        tmp = data[data.chapter == chapter]
-        page_nums = tmp.page.unique()
-
-        process_fn = partial(
-            process_page,
-            tmp=tmp,
-            files=files,
-            BUCKET_NAME=BUCKET_NAME,
-            MODEL_NAME=MODEL_NAME,
-            SYSTEM_PROMPT=SYSTEM_PROMPT,
-            BATCH_SIZE=BATCH_SIZE,
+        for chapter, page_num in pages
+    ]
+    results = [future.result() for future in futures]
+    logger.info(f"Parallel processing done, {sum(r is None for r in results)} pages failed")
+
+
+def main_async(segment_path_dict, page_index, BUCKET_NAME, MODEL_NAME, SYSTEM_PROMPT):
+    pages = []
+    candidates = chapter_page_candidates(page_index)
+    for chapter, files in segment_path_dict.items():
+        tmp = candidates.get(chapter, {})
+        pages.extend((page_num, tmp, files) for page_num in tmp)
+
+    logger.info(f"Starting async processing of {len(pages)} pages")
+    s3_client = get_s3_client(max_pool_connections=MAX_CONCURRENCY + PREFETCH_SEGMENTS)
+    results = asyncio.run(
+        run_matching(
+            pages,
+            AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY")),
+            s3_client,
+            BUCKET_NAME,
+            MODEL_NAME,
+            SYSTEM_PROMPT,
+            BATCH_SIZE,
+            max_concurrency=MAX_CONCURRENCY,
+            requests_per_minute=REQUESTS_PER_MINUTE,
+            tokens_per_minute=TOKENS_PER_MINUTE,
+            journal_dir=JOURNAL_DIR,
+            response_cache=get_response_cache(s3_client),
         )
+    )
+    failed = sum(result is None for result in results)
+    logger.info(f"Async processing done, {failed} pages failed")
+
+
+def main_batch(segment_path_dict, page_index, BUCKET_NAME, MODEL_NAME, SYSTEM_PROMPT):
+    pages = []
+    candidates = chapter_page_candidates(page_index)
+    for chapter, files in segment_path_dict.items():
+        tmp = candidates.get(chapter, {})
+        pages.extend((page_num, tmp, files) for page_num in tmp)
+
+    logger.info(f"Starting batch processing of {len(pages)} pages")
+    s3_client = get_s3_client()
+    results = process_pages_batch(
+        pages,
+        OpenAI(api_key=os.getenv("OPENAI_API_KEY")),
+        s3_client,
+        BUCKET_NAME,
+        MODEL_NAME,
+        SYSTEM_PROMPT,
+        BATCH_WORK_DIR,
+        BATCH_SIZE,
+        journal_dir=JOURNAL_DIR,
+        response_cache=get_response_cache(s3_client),
+    )
+    failed = sum(result is None for result in results.values())
+    logger.info(f"Batch processing done, {failed} pages failed")
 
-        # Add delayed tasks for parallel processing
-        tasks.extend(delayed(process_fn)(page_num) for page_num in page_nums)
 
-    # Execute all tasks in parallel
-    logger.info("Starting parallel processing")
-    with parallel_backend("loky", n_jobs=-1):
-        results = Parallel()(tasks)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Match audio segments with verses.")
+    parser.add_argument(
+        "--engine",
+        choices=["loky", "async", "batch"],
+        default="loky",
+        help=(
+            "loky: one page per process; async: every page from a single event loop; "
+            "batch: rounds of OpenAI Batch API requests"
+        ),
+    )
+    parser.add_argument(
+        "--prefilter",
+        metavar="WHISPER_MODEL",
+        default=None,
+        help=(
+            "loky engine only: transcribe the segments locally with this Whisper model "
+            "(e.g. small) and only send the low-confidence ones to the audio model"
+        ),
+    )
+    args = parser.parse_args()
 
+    page_index, segment_path_dict = load_inputs(get_s3_client())
 
-if __name__ == "__main__":
-    main(segment_path_dict, data, BUCKET_NAME, MODEL_NAME, SYSTEM_PROMPT)
+    if args.engine == "async":
+        main_async(segment_path_dict, page_index, BUCKET_NAME, MODEL_NAME, SYSTEM_PROMPT)
+    elif args.engine == "batch":
+        main_batch(segment_path_dict, page_index, BUCKET_NAME, MODEL_NAME, SYSTEM_PROMPT)
+    else:
+        main(segment_path_dict, page_index, BUCKET_NAME, MODEL_NAME, SYSTEM_PROMPT, args.prefilter)
@@ -1,7 +1,10 @@
 import os
+import argparse
 from datasets import load_dataset, load_from_disk, concatenate_datasets, Features, Value, Dataset, DownloadConfig
 from loguru import logger
 
+from shelpers.hub_delta import LocalRepo, HubRepo, append_rows, COLUMNS
+
 def process_dataset(current_dataset_path, incoming_dataset_path, output_dataset_path, storage_options, hf_token, commit_message):
     """
     Charge, sélectionne les colonnes attendues, fusionne deux datasets audio, puis pousse le résultat sur le Hub Hugging Face
@@ -49,7 +52,45 @@ def process_dataset(current_dataset_path, incoming_dataset_path, output_dataset_
     final_dataset.push_to_hub(output_dataset_path, commit_message=commit_message)
     logger.info("Push terminé avec succès ✅")
 
+def append_dataset(repo, incoming_dataset_path, storage_options, commit_message, work_dir="hf_delta"):
+    """
+    Ajoute au dataset uniquement les lignes nouvelles du dataset entrant, dans un nouveau shard parquet
+
+    Contrairement à `process_dataset`, le dataset actuel n'est ni téléchargé ni repoussé :
+    les lignes déjà présentes sont détectées grâce à l'index de hashes de chaque shard.
+
+    Args:
+        repo (LocalRepo | HubRepo): Dépôt cible (Hub, ou dossier local pour tester).
+        incoming_dataset_path (str): Chemin du nouveau dataset à intégrer.
+        storage_options (dict): Options pour accéder au stockage distant.
+        commit_message (str): Message de commit.
+        work_dir (str): Dossier local des fichiers à pousser.
+
+    Returns:
+        int: Nombre de lignes ajoutées.
+    """
+    logger.info("Chargement du dataset entrant depuis le stockage...")
+    incoming = load_from_disk(incoming_dataset_path, storage_options=storage_options).to_pandas()
+    appended = append_rows(repo, incoming[COLUMNS], work_dir, commit_message)
+    logger.info(f"{appended} lignes ajoutées ✅")
+    return appended
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ajoute un dataset entrant au dataset du Hub.")
+    parser.add_argument(
+        "--mode",
+        choices=["append", "full"],
+        default="append",
+        help="append: pousse seulement les nouvelles lignes; full: re-pousse tout le dataset",
+    )
+    parser.add_argument(
+        "--local-repo",
+        default=None,
+        help="Dossier local utilisé à la place du dépôt Hub (mode append)",
+    )
+    args = parser.parse_args()
+
     BUCKET_NAME = "moore-collection"
     
     ########################## Change me ######################################
@@ -66,12 +107,16 @@ if __name__ == "__main__":
     }
     
     HF_TOKEN = os.getenv("HF_TOKEN")
-    
-    process_dataset(
-        CURRENT_DATASET_PATH,
-        INCOMING_DATASET_PATH,
-        OUTPUT_DATASET_PATH,
-        storage_options,
-        HF_TOKEN,
-        COMMIT_MESSAGE
-    )
+
+    if args.mode == "append":
+        repo = LocalRepo(args.local_repo) if args.local_repo else HubRepo(OUTPUT_DATASET_PATH, HF_TOKEN)
+        append_dataset(repo, INCOMING_DATASET_PATH, storage_options, COMMIT_MESSAGE)
+    else:
+        process_dataset(
+            CURRENT_DATASET_PATH,
+            INCOMING_DATASET_PATH,
+            OUTPUT_DATASET_PATH,
+            storage_options,
+            HF_TOKEN,
+            COMMIT_MESSAGE
+        )
@@ -0,0 +1,244 @@
+import random
+import asyncio
+from loguru import logger
+from openai import RateLimitError
+
+from .llm_utils import (
+    build_chat_with_audio_request,
+    audio_cache_key,
+    build_page_candidates,
+    fetch_audio_base64,
+    parse_model_result,
+    batch_result_paths,
+    final_batch_paths,
+    save_and_upload_results,
+    CandidateWindow,
+)
+from .path_collectors import get_page_segments
+from .journal import open_page_journal
+from .rate_limiter import RETRYABLE_ERRORS, AsyncRateLimiter, retry_after
+
+# Rough token cost of an audio input: ~10 tokens per second of speech, and the
+# segments are ~64 kbit/s mp3, i.e. ~8000 bytes per second.
+AUDIO_TOKENS_PER_BYTE = 10 / 8000
+
+
+def estimate_tokens(request):
+    """Estimates the tokens of a `build_chat_with_audio_request` payload."""
+    tokens = 0
+    for message in request["messages"]:
+        for part in message["content"]:
+            if part["type"] == "text":
+                tokens += len(part["text"]) // 4
+            elif part["type"] == "input_audio":
+                audio_bytes = len(part["input_audio"]["data"]) * 3 // 4
+                tokens += int(audio_bytes * AUDIO_TOKENS_PER_BYTE)
+    return tokens
+
+
+async def achat_with_audio(
+    client,
+    query,
+    input_audio_base64,
+    model,
+    system_prompt,
+    limiter,
+    max_retries=6,
+    base_delay=1.0,
+):
+    """
+    Async `chat_with_audio` going through the rate limiter, with exponential
+    backoff (and the server's `retry-after` when given) on 429 and transient errors.
+    """
+    request = build_chat_with_audio_request(
+        query, input_audio_base64, model, system_prompt
+    )
+    estimated = estimate_tokens(request)
+    for attempt in range(max_retries):
+        await limiter.acquire(estimated)
+        try:
+            response = await client.chat.completions.create(**request)
+        except RETRYABLE_ERRORS as e:
+            if attempt == max_retries - 1:
+                raise
+            delay = retry_after(e) or base_delay * 2**attempt * (1 + random.random())
+            if isinstance(e, RateLimitError):
+                limiter.pause(delay)
+            logger.warning(f"{type(e).__name__}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            continue
+
+        if response.usage is not None:
+            limiter.consume(response.usage.total_tokens - estimated)
+        return response
+
+
+async def process_page_async(
+    page_num,
+    tmp,
+    files,
+    openai_client,
+    s3_client,
+    BUCKET_NAME,
+    MODEL_NAME,
+    SYSTEM_PROMPT,
+    semaphore,
+    limiter,
+    BATCH_SIZE=50,
+    journal_dir=None,
+    response_cache=None,
+):
+    """
+    Async counterpart of `process_single_page`.
+
+    The segments of a page stay strictly sequential because the candidate
+    window depends on the previous answers; concurrency comes from running
+    many pages at once. The next segment is downloaded while the current
+    request is in flight.
+
+    Returns:
+    - results: List of dictionaries with audio transcription and grades.
+    """
+    inputs = build_page_candidates(page_num, tmp)
+    page_files = get_page_segments(page_num, files)
+    if not page_files:
+        return []
+
+    def fetch(file):
+        return asyncio.create_task(
+            asyncio.to_thread(fetch_audio_base64, s3_client, BUCKET_NAME, file)
+        )
+
+    window = CandidateWindow(inputs)
+    journal = open_page_journal(journal_dir, page_files, page_num)
+    todo_files = [file for file in page_files if journal is None or file not in journal]
+    results = []
+    next_audio = fetch(todo_files[0]) if todo_files else None
+    fetched = 0
+
+    try:
+        for idx, file in enumerate(page_files, 1):
+            if journal is not None and file in journal:
+                results.append(journal.result(file))
+                window.restore(journal.window_state(file))
+            else:
+                audio_base64 = await next_audio
+                fetched += 1
+                if fetched < len(todo_files):
+                    next_audio = fetch(todo_files[fetched])
+
+                candidates = window.candidates()
+                result = None
+                if response_cache is not None:
+                    cache_key = audio_cache_key(
+                        candidates, audio_base64, MODEL_NAME, SYSTEM_PROMPT
+                    )
+                    result = await asyncio.to_thread(response_cache.get, cache_key)
+                if result is None:
+                    async with semaphore:
+                        response = await achat_with_audio(
+                            openai_client,
+                            candidates,
+                            audio_base64,
+                            MODEL_NAME,
+                            SYSTEM_PROMPT,
+                            limiter,
+                        )
+                    result = response.choices[0].message.content
+                    if response_cache is not None:
+                        await asyncio.to_thread(response_cache.put, cache_key, result)
+
+                transcription, grade = parse_model_result(result)
+                logger.info(f"model result: {result}")
+
+                record = {
+                    "audio_path": file,
+                    "grade": grade,
+                    "transcription": transcription,
+                }
+                results.append(record)
+                window.add(transcription)
+                if journal is not None:
+                    journal.append(record, window.state())
+
+            if idx % BATCH_SIZE == 0:
+                local_path, s3_key = batch_result_paths(file)
+                await asyncio.to_thread(
+                    save_and_upload_results, s3_client, results, local_path, BUCKET_NAME, s3_key
+                )
+                results = []
+    finally:
+        # On an error, the download of the next segment may still be running:
+        # cancel it and retrieve its outcome, so it is not left unretrieved.
+        if next_audio is not None:
+            next_audio.cancel()
+            await asyncio.gather(next_audio, return_exceptions=True)
+
+    if results:
+        local_path, s3_key = final_batch_paths(file, page_num)
+        await asyncio.to_thread(
+            save_and_upload_results, s3_client, results, local_path, BUCKET_NAME, s3_key
+        )
+
+    return results
+
+
+async def run_matching(
+    pages,
+    openai_client,
+    s3_client,
+    BUCKET_NAME,
+    MODEL_NAME,
+    SYSTEM_PROMPT,
+    BATCH_SIZE=50,
+    max_concurrency=32,
+    requests_per_minute=500,
+    tokens_per_minute=None,
+    journal_dir=None,
+    response_cache=None,
+):
+    """
+    Runs `process_page_async` over every page from a single process.
+
+    Parameters:
+    - pages: Iterable of `(page_num, tmp, files)` tuples, as given to `process_single_page`.
+    - openai_client: An `AsyncOpenAI` client.
+    - s3_client: A boto3 S3 client, with a connection pool of at least `max_concurrency`.
+    - max_concurrency: Maximum number of API calls in flight.
+    - requests_per_minute / tokens_per_minute: Rate limits of the OpenAI account.
+    - journal_dir: Folder of the per-page result journals used to resume.
+    - response_cache: Optional ResponseCache of the model answers.
+
+    Returns:
+    - List of per-page results (None for the pages that failed).
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    limiter = AsyncRateLimiter(requests_per_minute, tokens_per_minute)
+
+    async def guarded(page_num, tmp, files):
+        try:
+            result = await process_page_async(
+                page_num,
+                tmp,
+                files,
+                openai_client,
+                s3_client,
+                BUCKET_NAME,
+                MODEL_NAME,
+                SYSTEM_PROMPT,
+                semaphore,
+                limiter,
+                BATCH_SIZE,
+                journal_dir,
+                response_cache,
+            )
+            logger.info(f"Page {page_num} processed successfully.")
+            return result
+        except Exception as e:
+            logger.error(f"Error processing page {page_num}: {e}")
+            return None
+
+    results = await asyncio.gather(*(guarded(*page) for page in pages))
+    if response_cache is not None:
+        logger.info(f"Response cache: {response_cache.summary()}")
+    return results
@@ -0,0 +1,228 @@
+import os
+import glob
+import subprocess
+from collections import namedtuple
+
+import numpy as np
+
+_SAMPLE_DTYPES = {1: np.int8, 2: np.int16, 4: np.int32}
+
+# Cumulative energy of a decoded audio at every millisecond boundary.
+#   cumulative[i]: sum of the squared samples (all channels) before ms i
+#   frames[i]: index of the first frame of ms i, as pydub slices it
+Envelope = namedtuple("Envelope", ["cumulative", "frames", "channels", "max_amplitude"])
+
+
+def audio_to_array(audio):
+    """Returns the PCM samples of a pydub AudioSegment as a (frames, channels) array, without copy."""
+    samples = np.frombuffer(audio.raw_data, dtype=_SAMPLE_DTYPES[audio.sample_width])
+    return samples.reshape(-1, audio.channels)
+
+
+def energy_envelope(audio):
+    """
+    Computes the cumulative energy envelope of an AudioSegment, once.
+
+    Any window RMS is then two lookups, which is what lets `detect_silence`
+    be fully vectorised and lets the threshold sweeps reuse one decode.
+    """
+    samples = audio_to_array(audio).astype(np.int64)
+    frame_energy = (samples * samples).sum(axis=1)
+    cumulative = np.concatenate(([0], np.cumsum(frame_energy)))
+
+    n_ms = len(audio)
+    frames = (np.arange(n_ms + 1) * (audio.frame_rate / 1000.0)).astype(np.int64)
+    np.minimum(frames, len(frame_energy), out=frames)
+    return Envelope(cumulative[frames], frames, audio.channels, audio.max_possible_amplitude)
+
+
+def window_rms(envelope, window):
+    """RMS of every `window` ms window of the audio, indexed by its start in ms."""
+    energy = envelope.cumulative[window:] - envelope.cumulative[:-window]
+    count = (envelope.frames[window:] - envelope.frames[:-window]) * envelope.channels
+    # audioop.rms truncates to an integer.
+    return np.floor(np.sqrt(energy / np.maximum(count, 1)))
+
+
+def _silence_breaks(rms, window, silence_thresh, max_amplitude):
+    threshold = 10 ** (silence_thresh / 20) * max_amplitude
+    silence_starts = np.flatnonzero(rms <= threshold)
+    return silence_starts, np.flatnonzero(np.diff(silence_starts) > window)
+
+
+def detect_silence(envelope, min_silence_len=1000, silence_thresh=-16):
+    """
+    NumPy equivalent of `pydub.silence.detect_silence` (with `seek_step=1`).
+
+    Every `min_silence_len` ms window is tested at once: its RMS comes from
+    the envelope, the silent window starts are thresholded in one comparison
+    and consecutive runs are merged where two starts are more than
+    `min_silence_len` apart, exactly like pydub.
+
+    Parameters:
+    - envelope: The `energy_envelope` of the audio.
+    - min_silence_len: Minimum length of silence, in ms.
+    - silence_thresh: Silence threshold, in dBFS.
+
+    Returns:
+    - List of `[start, end]` silent ranges, in ms.
+    """
+    n_ms = len(envelope.cumulative) - 1
+    if n_ms < min_silence_len:
+        return []
+
+    window = min_silence_len
+    silence_starts, breaks = _silence_breaks(
+        window_rms(envelope, window), window, silence_thresh, envelope.max_amplitude
+    )
+    if not len(silence_starts):
+        return []
+
+    range_starts = silence_starts[np.concatenate(([0], breaks + 1))]
+    range_ends = silence_starts[np.concatenate((breaks, [len(silence_starts) - 1]))] + window
+    return [[int(start), int(end)] for start, end in zip(range_starts, range_ends)]
+
+
+def sweep_segment_counts(envelope, min_silence_lens, silence_threshs):
+    """
+    Number of segments `process_audio_with_silence_detection` would produce
+    for every parameter combination, from one envelope.
+
+    The window RMS is computed once per `min_silence_len` and only
+    thresholded again for each `silence_thresh`, so a whole grid costs about
+    as much as a few `detect_silence` calls and no re-decoding.
+
+    Returns:
+    - Dictionary `{(min_silence_len, silence_thresh): segment count}`.
+    """
+    n_ms = len(envelope.cumulative) - 1
+    counts = {}
+    for window in min_silence_lens:
+        rms = window_rms(envelope, window) if n_ms >= window else None
+        for silence_thresh in silence_threshs:
+            if rms is None:
+                counts[(window, silence_thresh)] = 0
+                continue
+            silence_starts, breaks = _silence_breaks(
+                rms, window, silence_thresh, envelope.max_amplitude
+            )
+            # One segment ends at every silent range.
+            counts[(window, silence_thresh)] = len(breaks) + 1 if len(silence_starts) else 0
+    return counts
+
+
+# ffmpeg encoder and container of each export format.
+EXPORT_CODECS = {
+    "mp3": ("libmp3lame", "mp3"),
+    "opus": ("libopus", "ogg"),
+    "flac": ("flac", "flac"),
+}
+_PCM_FORMATS = {2: "s16le", 4: "s32le"}
+
+
+def export_segments(audio, ranges, segment_folder, formats=("mp3",)):
+    """
+    Encodes every `[start, end]` ms range of a decoded audio with one ffmpeg process.
+
+    The kept ranges are written back to back to ffmpeg's stdin as memoryview
+    slices of the PCM buffer (no copy, no re-decode) and the segment muxer
+    cuts them at the cumulated range durations, for every requested format
+    at once. Cuts fall on the encoder's frame boundaries (~26 ms for mp3).
+
+    Parameters:
+    - audio: The decoded pydub AudioSegment.
+    - ranges: List of `[start, end]` ranges, in ms.
+    - segment_folder: Folder prefix of the outputs, `segment_<i>.<format>` with i from 1.
+    - formats: Export formats, keys of EXPORT_CODECS.
+
+    Returns:
+    - Dictionary `{format: [paths]}`, aligned with `ranges`.
+    """
+    if audio.sample_width not in _PCM_FORMATS:
+        audio = audio.set_sample_width(2)
+
+    frame_width = audio.frame_width
+    frame_rate = audio.frame_rate
+    frames = [
+        (int(start * frame_rate / 1000.0), int(end * frame_rate / 1000.0))
+        for start, end in ranges
+    ]
+    kept = [i for i, (start, end) in enumerate(frames) if end > start]
+    paths = {
+        fmt: [f"{segment_folder}segment_{i + 1}.{fmt}" for i in range(len(ranges))]
+        for fmt in formats
+    }
+
+    # Zero-length ranges (a silence at the very start) keep their number, as before.
+    for i in set(range(len(ranges))) - set(kept):
+        for fmt in formats:
+            audio[0:0].export(paths[fmt][i], format=fmt)
+    if not kept:
+        return paths
+
+    cumulated, cut_times = 0, []
+    for i in kept[:-1]:
+        cumulated += frames[i][1] - frames[i][0]
+        cut_times.append(f"{cumulated / frame_rate:.6f}")
+
+    command = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+        "-f", _PCM_FORMATS[audio.sample_width],
+        "-ar", str(frame_rate),
+        "-ac", str(audio.channels),
+        "-i", "pipe:0",
+    ]
+    for fmt in formats:
+        codec, muxer = EXPORT_CODECS[fmt]
+        command += ["-map", "0:a", "-c:a", codec, "-f", "segment", "-segment_format", muxer]
+        if cut_times:
+            command += ["-segment_times", ",".join(cut_times)]
+        command += ["-reset_timestamps", "1", f"{segment_folder}.part_%d.{fmt}"]
+
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    pcm = memoryview(audio.raw_data)
+    try:
+        for i in kept:
+            start, end = frames[i]
+            process.stdin.write(pcm[start * frame_width : end * frame_width])
+    finally:
+        process.stdin.close()
+    stderr = process.stderr.read()
+    if process.wait() != 0:
+        raise RuntimeError(f"ffmpeg segment export failed: {stderr.decode(errors='replace')}")
+
+    parts = {
+        fmt: [f"{segment_folder}.part_{part}.{fmt}" for part in range(len(kept))]
+        for fmt in formats
+    }
+    if not all(os.path.exists(path) for fmt in formats for path in parts[fmt]):
+        # A range shorter than one encoder frame can be merged with its
+        # neighbour by the muxer: fall back to one export per segment.
+        for fmt in formats:
+            for path in glob.glob(f"{glob.escape(segment_folder)}.part_*.{fmt}"):
+                os.remove(path)
+            for i in kept:
+                audio[ranges[i][0] : ranges[i][1]].export(paths[fmt][i], format=fmt)
+        return paths
+
+    for part, i in enumerate(kept):
+        for fmt in formats:
+            os.replace(parts[fmt][part], paths[fmt][i])
+    return paths
+
+
+def decode_audio(data, sample_rate=16000):
+    """
+    Decodes in-memory audio bytes (any format ffmpeg reads) to mono float32
+    samples in [-1, 1], the input Whisper expects, without a temporary file.
+    """
+    command = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-i", "pipe:0",
+        "-f", "s16le", "-ac", "1", "-ar", str(sample_rate),
+        "pipe:1",
+    ]
+    process = subprocess.run(command, input=data, capture_output=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg decode failed: {process.stderr.decode(errors='replace')}")
+    return np.frombuffer(process.stdout, np.int16).astype(np.float32) / 32768.0
@@ -0,0 +1,201 @@
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+
+from .batch_utils import run_batch
+from .journal import open_page_journal
+from .llm_utils import (
+    build_chat_with_audio_request,
+    build_page_candidates,
+    audio_cache_key,
+    fetch_audio_base64,
+    parse_model_result,
+    batch_result_paths,
+    final_batch_paths,
+    save_and_upload_results,
+    CandidateWindow,
+)
+from .path_collectors import get_page_segments
+
+
+class _PageState:
+    def __init__(self, page_num, page_files, window, journal):
+        self.page_num = page_num
+        self.chapter = page_files[0].split("/")[1]
+        self.files = page_files
+        self.window = window
+        self.journal = journal
+        self.results = []
+        self.position = 0
+        self.failures = 0
+        self.saved = False
+
+        # Replay what a previous run already journaled.
+        while (
+            journal is not None
+            and self.position < len(page_files)
+            and page_files[self.position] in journal
+        ):
+            file = page_files[self.position]
+            self.results.append(journal.result(file))
+            window.restore(journal.window_state(file))
+            self.position += 1
+
+    @property
+    def done(self):
+        return self.position >= len(self.files)
+
+    def next_chunk(self):
+        """Segments that share the current candidate window (until the next pruning)."""
+        size = self.window.prune_every - self.window.seen % self.window.prune_every
+        return self.files[self.position : self.position + size]
+
+
+def _save_page_results(s3_client, state, BUCKET_NAME, BATCH_SIZE):
+    """Uploads the results of a page with the same layout as `process_single_page`."""
+    results = state.results
+    full_batches = len(results) // BATCH_SIZE * BATCH_SIZE
+    for end in range(BATCH_SIZE, full_batches + 1, BATCH_SIZE):
+        local_path, s3_key = batch_result_paths(state.files[end - 1])
+        save_and_upload_results(
+            s3_client, results[end - BATCH_SIZE : end], local_path, BUCKET_NAME, s3_key
+        )
+    if results[full_batches:]:
+        local_path, s3_key = final_batch_paths(state.files[-1], state.page_num)
+        save_and_upload_results(
+            s3_client, results[full_batches:], local_path, BUCKET_NAME, s3_key
+        )
+
+
+def process_pages_batch(
+    pages,
+    openai_client,
+    s3_client,
+    BUCKET_NAME,
+    MODEL_NAME,
+    SYSTEM_PROMPT,
+    work_dir,
+    BATCH_SIZE=50,
+    journal_dir=None,
+    response_cache=None,
+    poll_interval=60,
+    max_workers=16,
+    max_failures=3,
+):
+    """
+    Runs the matching of many pages through the Batch API.
+
+    A page's candidate window only changes every `prune_every` segments, so the
+    segments are sent in rounds: each round holds, for every unfinished page,
+    its next segments sharing the current window. The answers are mapped back
+    to the records of `process_single_page` before the next round is built,
+    which keeps the results identical to the sequential engine.
+
+    Parameters:
+    - pages: Iterable of `(page_num, tmp, files)` tuples, as given to `process_single_page`.
+    - work_dir: Folder of the JSONL batch input files.
+    - journal_dir: Folder of the per-page result journals used to resume.
+    - response_cache: Optional ResponseCache of the model answers.
+    - poll_interval: Seconds between two batch status checks.
+    - max_workers: Concurrent S3 downloads when building a round.
+    - max_failures: Rounds a page may fail (a failed answer or an S3 segment
+      that cannot be read) before it is given up.
+
+    Returns:
+    - Dictionary `{(chapter, page_num): results}` of the pages with segments
+      (None for the pages that failed).
+    """
+    states = []
+    for page_num, tmp, files in pages:
+        page_files = get_page_segments(page_num, files)
+        if page_files:
+            window = CandidateWindow(build_page_candidates(page_num, tmp))
+            journal = open_page_journal(journal_dir, page_files, page_num)
+            states.append(_PageState(page_num, page_files, window, journal))
+
+    def fetch(file):
+        try:
+            return fetch_audio_base64(s3_client, BUCKET_NAME, file)
+        except Exception as e:
+            logger.warning(f"Could not read {file}: {e}")
+            return None
+
+    finished = {}
+    round_num = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while True:
+            active = [state for state in states if not state.done]
+            for state in states:
+                if state.done and not state.saved:
+                    _save_page_results(s3_client, state, BUCKET_NAME, BATCH_SIZE)
+                    finished[(state.chapter, state.page_num)] = state.results
+                    state.saved = True
+            if not active:
+                break
+
+            round_num += 1
+            chunks = {id(state): state.next_chunk() for state in active}
+            round_files = [file for chunk in chunks.values() for file in chunk]
+            audios = dict(zip(round_files, executor.map(fetch, round_files)))
+            for state in active:
+                # A page only goes on up to its first segment that could not be
+                # read; that segment is fetched again in the next round.
+                chunk = chunks[id(state)]
+                missing = [i for i, file in enumerate(chunk) if audios[file] is None]
+                if missing:
+                    chunks[id(state)] = chunk[: missing[0]]
+                    state.failures += 1
+            round_files = [file for chunk in chunks.values() for file in chunk]
+
+            answers, requests, cache_keys = {}, {}, {}
+            for state in active:
+                candidates = state.window.candidates()
+                for file in chunks[id(state)]:
+                    if response_cache is not None:
+                        cache_keys[file] = audio_cache_key(
+                            candidates, audios[file], MODEL_NAME, SYSTEM_PROMPT
+                        )
+                        answers[file] = response_cache.get(cache_keys[file])
+                    if answers.get(file) is None:
+                        requests[file] = build_chat_with_audio_request(
+                            candidates, audios[file], MODEL_NAME, SYSTEM_PROMPT
+                        )
+            del audios
+
+            logger.info(
+                f"Batch round {round_num}: {len(active)} pages, {len(requests)} requests, "
+                f"{len(round_files) - len(requests)} cached"
+            )
+            for file, content in run_batch(
+                openai_client, requests, work_dir, f"matching_round_{round_num}", poll_interval
+            ).items():
+                answers[file] = content
+                if content is not None and response_cache is not None:
+                    response_cache.put(cache_keys[file], content)
+
+            for state in active:
+                for file in chunks[id(state)]:
+                    result = answers.get(file)
+                    if result is None:
+                        state.failures += 1
+                        break
+                    transcription, grade = parse_model_result(result)
+                    record = {
+                        "audio_path": file,
+                        "grade": grade,
+                        "transcription": transcription,
+                    }
+                    state.results.append(record)
+                    state.window.add(transcription)
+                    state.position += 1
+                    if state.journal is not None:
+                        state.journal.append(record, state.window.state())
+
+                if state.failures >= max_failures:
+                    logger.error(
+                        f"Error processing page {state.page_num}: "
+                        f"{max_failures} failed batch rounds"
+                    )
+                    finished[(state.chapter, state.page_num)] = None
+                    states.remove(state)
+
+    return finished
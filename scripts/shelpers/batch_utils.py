@@ -0,0 +1,139 @@
+import os
+import json
+import time
+from loguru import logger
+
+CHAT_COMPLETIONS_ENDPOINT = "/v1/chat/completions"
+# The Batch API accepts input files up to 200 MB and 50 000 requests.
+MAX_BATCH_FILE_BYTES = 180 * 1024**2
+MAX_BATCH_REQUESTS = 50_000
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def write_batch_files(requests, output_prefix):
+    """
+    Writes `{custom_id: body}` requests as JSONL batch input files.
+
+    The requests are split so that every file stays under the Batch API limits
+    (base64 audio makes the lines large).
+
+    Returns:
+    - List of the written file paths.
+    """
+    os.makedirs(os.path.dirname(output_prefix) or ".", exist_ok=True)
+    paths, f, size, count = [], None, 0, 0
+    for custom_id, body in requests.items():
+        line = (
+            json.dumps(
+                {
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": CHAT_COMPLETIONS_ENDPOINT,
+                    "body": body,
+                },
+                ensure_ascii=False,
+            )
+            + "\n"
+        ).encode("utf-8")
+        if f is None or size + len(line) > MAX_BATCH_FILE_BYTES or count == MAX_BATCH_REQUESTS:
+            if f is not None:
+                f.close()
+            paths.append(f"{output_prefix}_{len(paths)}.jsonl")
+            f, size, count = open(paths[-1], "wb"), 0, 0
+        f.write(line)
+        size += len(line)
+        count += 1
+    if f is not None:
+        f.close()
+    return paths
+
+
+def submit_batch(client, path, description=""):
+    """Uploads a batch input file and creates the batch. Returns the batch id."""
+    with open(path, "rb") as f:
+        input_file = client.files.create(file=f, purpose="batch")
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint=CHAT_COMPLETIONS_ENDPOINT,
+        completion_window="24h",
+        metadata={"description": description} if description else None,
+    )
+    logger.info(f"Submitted batch {batch.id} from {path}")
+    return batch.id
+
+
+def wait_for_batches(client, batch_ids, poll_interval=60):
+    """Polls the batches until they all reach a terminal status. Returns them."""
+    batches = {}
+    pending = list(batch_ids)
+    while pending:
+        for batch_id in list(pending):
+            batch = client.batches.retrieve(batch_id)
+            if batch.status in TERMINAL_STATUSES:
+                # A batch that failed validation never gets request counts.
+                counts = batch.request_counts
+                logger.info(
+                    f"Batch {batch_id} {batch.status}: "
+                    + (
+                        f"{counts.completed} completed, {counts.failed} failed"
+                        if counts is not None
+                        else "no request counts"
+                    )
+                )
+                batches[batch_id] = batch
+                pending.remove(batch_id)
+        if pending:
+            time.sleep(poll_interval)
+    return [batches[batch_id] for batch_id in batch_ids]
+
+
+def read_batch_results(client, batch):
+    """
+    Returns `{custom_id: content}` for a finished batch.
+
+    Requests that failed are mapped to None.
+    """
+    results = {}
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        for line in client.files.content(file_id).text.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            response = item.get("response") or {}
+            if response.get("status_code") == 200:
+                content = response["body"]["choices"][0]["message"]["content"]
+            else:
+                logger.warning(f"Batch request {item['custom_id']} failed: {item.get('error')}")
+                content = None
+            results[item["custom_id"]] = content
+    return results
+
+
+def run_batch(client, requests, work_dir, name, poll_interval=60):
+    """
+    Sends `{custom_id: body}` chat completion requests through the Batch API
+    and blocks until every answer is back.
+
+    Parameters:
+    - client: The OpenAI client instance.
+    - requests: Mapping of a unique id to the chat completion body.
+    - work_dir: Folder where the JSONL input files are written.
+    - name: Prefix of the input files and batch description.
+    - poll_interval: Seconds between two status checks.
+
+    Returns:
+    - Dictionary `{custom_id: content}`, None for the failed requests.
+    """
+    if not requests:
+        return {}
+    paths = write_batch_files(requests, os.path.join(work_dir, name))
+    batch_ids = [submit_batch(client, path, description=name) for path in paths]
+
+    results = {}
+    for batch in wait_for_batches(client, batch_ids, poll_interval):
+        results.update(read_batch_results(client, batch))
+    for custom_id in requests:
+        results.setdefault(custom_id, None)
+    return results
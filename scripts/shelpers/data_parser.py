@@ -1,5 +1,7 @@
 import re
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import urllib
 
 
@@ -13,6 +15,75 @@ def clean_text(text: str) -> str:
     return text.strip()
 
 
+# `\s` de Python (str.isspace) pour RE2 : \s de RE2 ne couvre que l'ASCII.
+_WS = r"[\p{Z}\t\n\x0b\f\r\x1c-\x1f\x85]"
+# Caractères retirés par `str.strip()` (le dernier est U+3000).
+_STRIP_CHARS = "".join(chr(c) for c in range(0x3001) if chr(c).isspace())
+
+# Les étapes de `clean_text`, dans le même ordre : (motif, remplacement, regex).
+# Les guillemets sont remplacés un par un : trois remplacements littéraux
+# coûtent moins cher qu'une classe de caractères RE2.
+_CLEAN_STEPS = [
+    (rf"\+{_WS}*\.", ".", True),
+    (rf"\*{_WS}*\+{_WS}*;", ";", True),
+    (rf"\*{_WS}*\+", "", True),
+    (" + ", " ", False),
+    (" * ", " ", False),
+    ("+", " ", False),
+    ('"', "", False),
+    ("“", "", False),
+    ("”", "", False),
+]
+
+
+# `jwsoup.text.utils.clean_text`, qui nettoie les versets des jeux de données
+# bibliques, correspond aux cinq premières étapes, sans `strip()`.
+_JWSOUP_CLEAN_STEPS = _CLEAN_STEPS[:5]
+
+
+def _replace_column(values, steps, strip):
+    """Applique les `steps` à toute la colonne, avec les noyaux `pyarrow.compute`."""
+    if isinstance(values, (pa.Array, pa.ChunkedArray)):
+        array = values
+    else:
+        array = pa.array(values, pa.string(), from_pandas=True)
+    for pattern, replacement, is_regex in steps:
+        replace = pc.replace_substring_regex if is_regex else pc.replace_substring
+        array = replace(array, pattern=pattern, replacement=replacement)
+    if strip:
+        array = pc.utf8_trim(array, characters=_STRIP_CHARS)
+    if isinstance(values, pd.Series):
+        return array.to_pandas().set_axis(values.index).rename(values.name)
+    return array
+
+
+def clean_text_column(values):
+    """
+    Version vectorisée de `clean_text` pour une colonne entière.
+
+    Chaque étape est un noyau `pyarrow.compute` appliqué à toute la colonne
+    (pas d'appel Python par ligne) ; le résultat est identique à
+    `values.apply(clean_text)`, valeurs manquantes conservées.
+
+    Args:
+        values: pd.Series, tableau Arrow ou liste de chaînes.
+
+    Returns:
+        Le même type que `values` (pd.Series avec le même index, ou pa.Array).
+    """
+    return _replace_column(values, _CLEAN_STEPS, strip=True)
+
+
+def clean_verse_column(values):
+    """
+    Version vectorisée de `jwsoup.text.utils.clean_text` pour une colonne entière.
+
+    Même résultat que `values.map(jwsoup.text.utils.clean_text)`, valeurs
+    manquantes conservées ; mêmes arguments que `clean_text_column`.
+    """
+    return _replace_column(values, _JWSOUP_CLEAN_STEPS, strip=False)
+
+
 def splitter(text: str) -> list[str]:
     """Divise une chaîne en segments basés sur des séparateurs spécifiques."""
     return re.split(r"[,:;.]", clean_text(text))
@@ -29,6 +100,79 @@ def flatten_nested_values(nested_values: pd.Series) -> list[str]:
     return flattened
 
 
+# Séparateurs de `splitter` et numéro de verset retiré par `flatten_nested_values`
+# (`\d` de Python couvre tous les chiffres Unicode, celui de RE2 seulement l'ASCII).
+_SPLIT_PATTERN = r"[,:;.]"
+_VERSE_NUMBER = rf"^\p{{Nd}}+{_WS}*"
+
+
+def expand_candidates(values):
+    """
+    Version vectorisée de `flatten_nested_values(values.apply(splitter))`.
+
+    Nettoie, découpe, aplatit et retire les numéros de verset de toute la
+    colonne en noyaux `pyarrow.compute` ; les fragments vides sont écartés.
+
+    Args:
+        values: pd.Series, tableau Arrow ou liste de chaînes.
+
+    Returns:
+        (indices des lignes d'origine, fragments) : deux tableaux Arrow alignés,
+        dans l'ordre des lignes puis des fragments.
+    """
+    if not isinstance(values, (pa.Array, pa.ChunkedArray)):
+        values = pa.array(values, pa.string(), from_pandas=True)
+    parts = pc.split_pattern_regex(clean_text_column(values), pattern=_SPLIT_PATTERN)
+    parents = pc.list_parent_indices(parts)
+    fragments = pc.replace_substring_regex(
+        pc.list_flatten(parts), pattern=_VERSE_NUMBER, replacement=""
+    )
+    fragments = pc.utf8_trim(fragments, characters=_STRIP_CHARS)
+    keep = pc.not_equal(fragments, "")
+    return pc.filter(parents, keep), pc.filter(fragments, keep)
+
+
+def page_candidates(df, keys="page", text_column="moore_verse_text"):
+    """
+    Précalcule les fragments candidats de chaque page en une seule passe.
+
+    Args:
+        df: DataFrame des versets.
+        keys: Colonne(s) identifiant une page, par exemple ["chapter", "page"].
+        text_column: Colonne du texte des versets.
+
+    Returns:
+        {clé de page: liste des fragments}, identique à `build_page_candidates`
+        page par page ; les pages sans fragment ont une liste vide.
+    """
+    keys = [keys] if isinstance(keys, str) else list(keys)
+    parents, fragments = expand_candidates(df[text_column])
+    parents = parents.to_numpy()
+    groups = pd.Series(fragments.to_pylist(), dtype=object).groupby(
+        [df[key].to_numpy()[parents] for key in keys], sort=False
+    )
+    page_keys = df[keys].drop_duplicates().itertuples(index=False, name=None)
+    candidates = {key if len(keys) > 1 else key[0]: [] for key in page_keys}
+    candidates.update(groups.agg(list).to_dict())
+    return candidates
+
+
 def extract_audio_identifier(url):
     parts = url.strip("/").split("/")
     return urllib.parse.unquote(parts[-2]), int(parts[-1])
+
+
+def parse_audio_identifiers(urls: pd.Series) -> pd.DataFrame:
+    """
+    Version vectorisée de `extract_audio_identifier` pour une colonne d'URL.
+
+    Returns:
+        DataFrame (chapter, page) aligné sur `urls`.
+    """
+    parts = urls.str.strip("/").str.extract(r"(?P<chapter>[^/]*)/(?P<page>[^/]*)$")
+    chapters = parts["chapter"].unique()
+    parts["chapter"] = parts["chapter"].map(
+        dict(zip(chapters, map(urllib.parse.unquote, chapters)))
+    )
+    parts["page"] = parts["page"].astype(int)
+    return parts
@@ -0,0 +1,269 @@
+import os
+import re
+import json
+import glob
+import hashlib
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from .hub_delta import (
+    DELTA_SHARD_PATTERN,
+    file_sha256,
+    hash_index_path,
+    row_hashes,
+    write_hash_index,
+)
+from .s3_manifest import list_s3_objects
+
+# One partition of the dataset:
+#   name: partition name, also the parquet file name (train-<name>.parquet)
+#   fingerprint: function returning a hash of everything the partition is built from
+#   load: function returning the partition as a DataFrame
+Source = namedtuple("Source", ["name", "fingerprint", "load"])
+
+COLUMNS = ["french", "moore", "source"]
+PAIR_COLUMNS = ["french", "moore"]
+STATE_FILE = "_build_state.json"
+# Single-file layout written by `Dataset.push_to_hub`, replaced by the partitions.
+LEGACY_SHARD_PATTERN = re.compile(r"^data/train-\d{5}-of-\d{5}\.parquet$")
+# Local copies of the rewritten shards, under the output folder.
+ABSORB_DIR = "_absorbed"
+
+
+def files_fingerprint(*patterns, version=""):
+    """sha256 of the names and contents of the files matching glob patterns."""
+    digest = hashlib.sha256(version.encode("utf-8"))
+    paths = sorted({path for pattern in patterns for path in glob.glob(pattern, recursive=True)})
+    for path in paths:
+        if not os.path.isfile(path):
+            continue
+        digest.update(os.path.basename(path).encode("utf-8"))
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def s3_prefix_fingerprint(s3_client, bucket_name, prefix, version=""):
+    """sha256 of the keys and ETags under an S3 prefix (e.g. a `save_to_disk` dataset)."""
+    objects, _ = list_s3_objects(s3_client, bucket_name, prefix)
+    digest = hashlib.sha256(version.encode("utf-8"))
+    for obj in sorted(objects, key=lambda obj: obj["key"]):
+        digest.update(f"{obj['key']}:{obj['etag']}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def partition_path(output_dir, name):
+    return os.path.join(output_dir, f"train-{name}.parquet")
+
+
+def load_build_state(output_dir):
+    path = os.path.join(output_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_build_state(output_dir, state):
+    path = os.path.join(output_dir, STATE_FILE)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, ensure_ascii=False)
+    os.replace(f"{path}.tmp", path)
+
+
+def build_dataset(sources, output_dir, force=False):
+    """
+    Builds one parquet partition per source, only for the sources whose inputs changed.
+
+    The fingerprint of every source is compared with the one recorded at its
+    last build in `<output_dir>/_build_state.json`; unchanged partitions are
+    left untouched, so adding or updating one source only rewrites its file.
+    Partitions of sources that no longer exist are removed (and marked so
+    that the next push deletes them from the Hub).
+
+    Parameters:
+    - sources: List of Source.
+    - output_dir: Folder of the `train-<name>.parquet` partitions.
+    - force: Rebuild every partition.
+
+    Returns:
+    - (rebuilt partition names, removed partition names)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    state = load_build_state(output_dir)
+    rebuilt = []
+    for source in sources:
+        fingerprint = source.fingerprint()
+        entry = state.get(source.name, {})
+        path = partition_path(output_dir, source.name)
+        if not force and entry.get("hash") == fingerprint and os.path.exists(path):
+            logger.info(f"{source.name}: unchanged ({entry['rows']} rows)")
+            continue
+
+        df = source.load()[COLUMNS].reset_index(drop=True)
+        df.to_parquet(f"{path}.tmp", index=False)
+        os.replace(f"{path}.tmp", path)
+        state[source.name] = {"hash": fingerprint, "rows": len(df), "pushed": entry.get("pushed")}
+        save_build_state(output_dir, state)
+        rebuilt.append(source.name)
+        logger.info(f"{source.name}: rebuilt ({len(df)} rows)")
+
+    names = {source.name for source in sources}
+    removed = [
+        name for name, entry in state.items() if name not in names and not entry.get("removed")
+    ]
+    for name in removed:
+        if os.path.exists(partition_path(output_dir, name)):
+            os.remove(partition_path(output_dir, name))
+        state[name] = {"removed": True}
+    save_build_state(output_dir, state)
+    return rebuilt, removed
+
+
+def partition_rows(output_dir, state):
+    """Rows of every local partition that is part of the dataset."""
+    frames = [
+        pd.read_parquet(partition_path(output_dir, name), columns=COLUMNS)
+        for name, entry in state.items()
+        if not entry.get("removed")
+    ]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=COLUMNS)
+
+
+def normalise_sources(df, partitions):
+    """
+    Relabels the rows whose source is not the source of any partition (a label
+    from before the partitions, e.g. of the concatenated Bible rows) with the
+    source of the partition row holding the same (french, moore) pair.
+
+    Rows with a current source label, or whose pair no partition holds, keep
+    their label.
+    """
+    legacy = ~df["source"].isin(set(partitions["source"]))
+    if not legacy.any():
+        return df
+    pair_sources = pd.Series(
+        partitions["source"].to_numpy(), index=row_hashes(partitions, PAIR_COLUMNS)
+    )
+    pair_sources = pair_sources[~pair_sources.index.duplicated()]
+    mapped = pd.Series(row_hashes(df[legacy], PAIR_COLUMNS)).map(pair_sources).to_numpy()
+    df = df.copy()
+    df.loc[legacy, "source"] = np.where(
+        pd.isna(mapped), df.loc[legacy, "source"].to_numpy(), mapped
+    )
+    return df
+
+
+def absorb_shards(repo, files, shards, partitions, work_dir):
+    """
+    Removes from the repository shards the rows that the partitions cover.
+
+    The shard rows are compared on (french, moore, source), after mapping the
+    legacy source labels to the partitions' (see `normalise_sources`). A shard
+    whose rows are all covered is deleted (with its hash index), a partly
+    covered one is rewritten with only its other rows, and an uncovered one
+    is left untouched: no row that exists only in a shard is ever lost.
+
+    Returns:
+    - ({path_in_repo: local_path} to upload, [path_in_repo] to delete)
+    """
+    covered = row_hashes(partitions)
+    additions, deletions = {}, []
+    for shard in shards:
+        df = pd.read_parquet(repo.download(shard), columns=COLUMNS)
+        keep = ~np.isin(row_hashes(normalise_sources(df, partitions)), covered)
+        sidecar = hash_index_path(shard)
+        if not keep.any():
+            logger.info(f"{shard}: all {len(df)} rows are in the partitions, deleting it")
+            deletions.append(shard)
+            if sidecar in files:
+                deletions.append(sidecar)
+        elif not keep.all():
+            logger.info(
+                f"{shard}: {int((~keep).sum())} rows are in the partitions, "
+                f"keeping its {int(keep.sum())} other rows"
+            )
+            local_shard = os.path.join(work_dir, shard)
+            local_sidecar = os.path.join(work_dir, sidecar)
+            os.makedirs(os.path.dirname(local_shard), exist_ok=True)
+            os.makedirs(os.path.dirname(local_sidecar), exist_ok=True)
+            df[keep].to_parquet(local_shard, index=False)
+            write_hash_index(row_hashes(df[keep]), file_sha256(local_shard), local_sidecar)
+            additions[shard] = local_shard
+            additions[sidecar] = local_sidecar
+        else:
+            logger.info(f"{shard}: none of its {len(df)} rows are in the partitions, keeping it")
+    return additions, deletions
+
+
+def push_partitions(output_dir, repo, commit_message=None):
+    """
+    Uploads, in one commit, only the partitions not pushed since their last build.
+
+    Partitions go to `data/train-<name>.parquet`, which the Hub reads as the
+    train split. The partitions of removed sources and their hash indexes
+    are deleted in the same commit. The single-file shards of `push_to_hub` and the delta shards of
+    `hub_delta.append_rows` are absorbed (see `absorb_shards`): only the rows
+    the partitions already hold are removed, so the two writers never
+    duplicate a row.
+
+    Parameters:
+    - output_dir: Folder of the partitions.
+    - repo: LocalRepo or HubRepo (see `hub_delta`).
+    - commit_message: Message of the repository commit.
+
+    Returns:
+    - Names of the uploaded partitions.
+    """
+    state = load_build_state(output_dir)
+    pending = [
+        name
+        for name, entry in state.items()
+        if not entry.get("removed") and entry.get("pushed") != entry["hash"]
+    ]
+    removed_names = [name for name, entry in state.items() if entry.get("removed")]
+    files = repo.list_files()
+    additions = {
+        f"data/train-{name}.parquet": partition_path(output_dir, name) for name in pending
+    }
+    # A removed partition goes with the hash index `append_rows` keeps for it.
+    deletions = [
+        path
+        for name in removed_names
+        for path in (f"data/train-{name}.parquet", hash_index_path(f"data/train-{name}.parquet"))
+        if path in files
+    ]
+    shards = [
+        path
+        for path in files
+        if LEGACY_SHARD_PATTERN.match(path) or DELTA_SHARD_PATTERN.match(path)
+    ]
+    if shards:
+        absorbed, absorbed_deletions = absorb_shards(
+            repo,
+            files,
+            shards,
+            partition_rows(output_dir, state),
+            os.path.join(output_dir, ABSORB_DIR),
+        )
+        additions.update(absorbed)
+        deletions += absorbed_deletions
+
+    if additions or deletions:
+        repo.commit(
+            additions,
+            commit_message or f"Update {', '.join(pending) or 'partitions'}",
+            deletions,
+        )
+        logger.info(f"Pushed {len(pending)} partitions, deleted {len(deletions)} files")
+    else:
+        logger.info("Every partition is already on the Hub")
+    for name in pending:
+        state[name]["pushed"] = state[name]["hash"]
+    for name in removed_names:
+        del state[name]
+    save_build_state(output_dir, state)
+    return pending
@@ -0,0 +1,223 @@
+import os
+import re
+import ast
+import json
+import base64
+import argparse
+from typing import List
+from pathlib import Path
+from functools import partial
+from loguru import logger
+from openai import OpenAI
+
+from .batch_utils import run_batch
+from .extraction_runner import run_page_extraction, compare_extractions
+from .image_utils import ImagePreprocessor
+from .pdf_utils import iter_pdf_pages
+
+MODEL_NAME = "gpt-4o"
+
+
+def convert_image_to_base64(image_path: str) -> str:
+    with open(image_path, "rb") as image_file:
+        return base64.b64encode(image_file.read()).decode("utf-8")
+
+
+def create_prompt_for_dictionary(instruction, base64_image) -> List[dict]:
+    # One page image, or the list of its column images.
+    images = [base64_image] if isinstance(base64_image, str) else base64_image
+    return [
+        {
+            "role": "user",
+            "content": [{"type": "text", "text": instruction}]
+            + [
+                {
+                    "type": "image_url",
+                    "image_url": {"url": f"data:image/jpg;base64,{image}"},
+                }
+                for image in images
+            ],
+        }
+    ]
+
+
+def get_llm_respone(client, instruction, base64_image, model_name) -> str:
+    response = client.chat.completions.create(
+        model=model_name,
+        messages=create_prompt_for_dictionary(instruction, base64_image),
+        max_tokens=8000,
+    )
+    return response.choices[0].message.content
+
+
+def extract_output(text, tag):
+    pattern = rf"<{tag}>(.*?)</{tag}>"
+    matches = re.findall(pattern, text, re.DOTALL)
+    return matches[0]
+
+
+def parse_llm_output(llm_output, image_path):
+    try:
+        return ast.literal_eval(extract_output(llm_output, "output"))
+    except (IndexError, ValueError, SyntaxError):
+        logger.warning(f"{image_path}: no parsable <output> in the answer")
+        return None
+
+
+def page_to_base64(image_path, preprocessor=None):
+    """The raw page, or its preprocessed image(s) when a preprocessor is given."""
+    if preprocessor is None:
+        return convert_image_to_base64(image_path)
+    return [base64.b64encode(image).decode("utf-8") for image in preprocessor(image_path)]
+
+
+def parse_page_with_gpt(client, instruction, image_path, preprocessor=None):
+    image_base64 = page_to_base64(image_path, preprocessor)
+    llm_output = get_llm_respone(client, instruction, image_base64, MODEL_NAME)
+    return parse_llm_output(llm_output, image_path)
+
+
+def parse_pages_with_batch(
+    client, instruction, images, work_dir, model_name=MODEL_NAME, preprocessor=None
+):
+    """Sends every page through the OpenAI Batch API, same output as `parse_page_with_gpt`."""
+    requests = {
+        str(image): {
+            "model": model_name,
+            "messages": create_prompt_for_dictionary(
+                instruction, page_to_base64(image, preprocessor)
+            ),
+            "max_tokens": 8000,
+        }
+        for image in images
+    }
+    contents = run_batch(client, requests, work_dir, "dictionary_extraction")
+    return [
+        parse_llm_output(contents[str(image)], image) if contents[str(image)] else None
+        for image in images
+    ]
+
+
+def build_parser(defaults):
+    """
+    Command line of a dictionary extraction job.
+
+    Parameters:
+    - defaults: Job defaults by argument name, e.g. `folder_path`,
+      `output_json_path`, `pdf` or `batch_dir`. The positional paths become
+      optional when the job gives them a default.
+    """
+    parser = argparse.ArgumentParser(description="Process images and extract text.")
+    for name, help in (
+        ("folder_path", "Path to the folder containing images"),
+        ("output_json_path", "Path to save the result JSON"),
+    ):
+        if name in defaults:
+            parser.add_argument(name, type=str, nargs="?", help=help)
+        else:
+            parser.add_argument(name, type=str, help=help)
+    parser.add_argument("--batch", action="store_true", help="Use the OpenAI Batch API")
+    parser.add_argument(
+        "--batch-dir",
+        type=str,
+        default="batches/dictionary_extraction",
+        help="Folder of the batch input files",
+    )
+    parser.add_argument(
+        "--pages-dir",
+        type=str,
+        default=None,
+        help="Folder of the per-page results (default: <output_json_path>.pages)",
+    )
+    parser.add_argument("--workers", type=int, default=8, help="Pages extracted concurrently")
+    parser.add_argument(
+        "--force", action="store_true", help="Extract the pages already done again"
+    )
+    parser.add_argument(
+        "--pdf",
+        type=str,
+        default=None,
+        help="Render this PDF into folder_path and extract the pages as they are rendered",
+    )
+    parser.add_argument(
+        "--preprocess",
+        action="store_true",
+        help="Send grayscale, deskewed, cropped and downscaled pages",
+    )
+    parser.add_argument(
+        "--max-edge", type=int, default=2000, help="Longest side of the preprocessed images"
+    )
+    parser.add_argument(
+        "--quality", type=int, default=70, help="JPEG quality of the preprocessed images"
+    )
+    parser.add_argument(
+        "--split-columns",
+        action="store_true",
+        help="Send the two columns of a page as two images",
+    )
+    parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="Also extract the raw pages and compare them with the preprocessed ones",
+    )
+    parser.set_defaults(**defaults)
+    return parser
+
+
+def main(instruction, defaults, argv=None):
+    """
+    Runs a dictionary extraction job: every page image (or page of `--pdf`)
+    is sent with `instruction` and the parsed entries are saved as JSON.
+
+    Parameters:
+    - instruction: Prompt of the dictionary, asking for the entries in an <output> tag.
+    - defaults: Job defaults of the command line, see `build_parser`.
+    - argv: Command line arguments (default: sys.argv).
+    """
+    args = build_parser(defaults).parse_args(argv)
+    folder_path = args.folder_path
+    output_json_path = args.output_json_path
+
+    if args.pdf:
+        images = iter_pdf_pages(args.pdf, folder_path, dpi=300)
+        if args.batch or args.compare:
+            images = list(images)
+    else:
+        images = list(Path(folder_path).glob("*.jpg"))
+    preprocessor = None
+    if args.preprocess or args.compare:
+        preprocessor = ImagePreprocessor(
+            max_long_edge=args.max_edge, quality=args.quality, columns=args.split_columns
+        )
+    suffix = ".preprocessed" if preprocessor else ""
+    # One client for every page: it pools the connections across the worker threads.
+    client = OpenAI(api_key=os.getenv("API_KEY"))
+
+    if args.batch:
+        text_of_pages = parse_pages_with_batch(
+            client, instruction, images, args.batch_dir, preprocessor=preprocessor
+        )
+    else:
+        text_of_pages = run_page_extraction(
+            images,
+            partial(parse_page_with_gpt, client, instruction, preprocessor=preprocessor),
+            args.pages_dir or f"{output_json_path}{suffix}.pages",
+            max_workers=args.workers,
+            force=args.force,
+        )
+    if preprocessor is not None:
+        logger.info(preprocessor.summary())
+
+    if args.compare:
+        raw_pages = run_page_extraction(
+            images,
+            partial(parse_page_with_gpt, client, instruction),
+            f"{output_json_path}.pages",
+            max_workers=args.workers,
+            force=args.force,
+        )
+        logger.info(f"Raw vs preprocessed: {compare_extractions(raw_pages, text_of_pages)}")
+    with open(output_json_path, "w", encoding="utf_8") as f:
+        json.dump(text_of_pages, f, indent=4, ensure_ascii=False)
+
+    logger.info(f"Text extracted and saved to {output_json_path}")
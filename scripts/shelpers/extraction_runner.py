@@ -0,0 +1,127 @@
+import os
+import json
+import time
+import random
+from collections import Counter
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from loguru import logger
+
+from .rate_limiter import RETRYABLE_ERRORS
+
+
+def page_result_path(output_dir, page):
+    return os.path.join(output_dir, f"{Path(page).stem}.json")
+
+
+def _write_json(path, result):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf_8") as f:
+        json.dump(result, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _extract_with_retry(extract_fn, page, output_dir, retries, backoff):
+    # Only transient API errors and unparsable answers are retried: any other
+    # error (authentication, bad request, removed API...) fails every page the
+    # same way and is raised at once.
+    for attempt in range(retries + 1):
+        try:
+            result = extract_fn(page)
+            if result is not None:
+                _write_json(page_result_path(output_dir, page), result)
+                return result
+            error = "no parsable output"
+        except RETRYABLE_ERRORS as e:
+            error = e
+        if attempt < retries:
+            delay = backoff * 2**attempt + random.uniform(0, backoff)
+            logger.warning(f"{page}: attempt {attempt + 1} failed ({error}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+    logger.error(f"{page}: giving up after {retries + 1} attempts ({error})")
+    return None
+
+
+def run_page_extraction(
+    pages, extract_fn, output_dir, max_workers=8, retries=3, backoff=2.0, force=False
+):
+    """
+    Runs a page extraction over a thread pool, with one result file per page.
+
+    Every page's result is written to `<output_dir>/<page stem>.json` as soon
+    as it completes, so a crash only loses the pages in flight, and pages
+    that already have a result file are loaded instead of being sent again.
+    A page whose extraction hits a transient API error (rate limit, timeout,
+    connection or server error) or returns None is retried with an
+    exponential backoff; if it still fails, no file is written and the next
+    run retries it. Any other error is raised, after cancelling the pages
+    not started yet.
+
+    Parameters:
+    - pages: Page image paths. Any iterable: pages are submitted as they are
+      yielded, e.g. by `iter_pdf_pages` while the PDF is still being rendered.
+    - extract_fn: Function of a page path returning its JSON-serialisable result.
+    - output_dir: Folder of the per-page result files.
+    - max_workers: Pages extracted concurrently.
+    - retries: Extra attempts of a failed page.
+    - backoff: Base delay between two attempts, in seconds.
+    - force: Extract every page again, even when its result file exists.
+
+    Returns:
+    - List of the results, in the order of `pages` (None for the failed pages).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    results, order, futures = {}, [], {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for page in pages:
+            order.append(page)
+            path = page_result_path(output_dir, page)
+            if not force and os.path.exists(path):
+                with open(path, encoding="utf_8") as f:
+                    results[page] = json.load(f)
+            else:
+                futures[
+                    executor.submit(
+                        _extract_with_retry, extract_fn, page, output_dir, retries, backoff
+                    )
+                ] = page
+        logger.info(f"{len(results)} pages already extracted, {len(futures)} to extract")
+
+        for done, future in enumerate(as_completed(futures), 1):
+            page = futures[future]
+            try:
+                results[page] = future.result()
+            except Exception:
+                for pending in futures:
+                    pending.cancel()
+                raise
+            if results[page] is not None:
+                logger.info(f"[{done}/{len(futures)}] {page} extracted")
+
+    pages = order
+    failed = sum(results[page] is None for page in pages)
+    if failed:
+        logger.warning(f"{failed} pages failed, rerun to retry them")
+    return [results[page] for page in pages]
+
+
+def compare_extractions(reference, candidate):
+    """
+    Compares two extractions of the same pages (e.g. raw vs preprocessed images).
+
+    Returns:
+    - Summary string with the entry counts and the share of the reference
+      entries found identically in the candidate, page by page.
+    """
+    ref_entries = cand_entries = common = 0
+    for ref_page, cand_page in zip(reference, candidate):
+        ref_keys = Counter(json.dumps(entry, sort_keys=True) for entry in ref_page or [])
+        cand_keys = Counter(json.dumps(entry, sort_keys=True) for entry in cand_page or [])
+        ref_entries += sum(ref_keys.values())
+        cand_entries += sum(cand_keys.values())
+        common += sum((ref_keys & cand_keys).values())
+    return (
+        f"{len(reference)} pages: {ref_entries} reference entries, {cand_entries} candidate "
+        f"entries, {common / ref_entries if ref_entries else 0:.1%} of the reference "
+        f"entries found identically"
+    )
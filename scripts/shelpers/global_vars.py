@@ -4,3 +4,21 @@ SYSTEM_PROMPT = """Given the audios uploaded, find the best transcription in Moo
  Return results in tag <output></output> <grade><grade>.When multiples choices, separate values with `,`. First element of the list is generally a god answers."""
 MODEL_NAME = "gpt-4o-mini-audio-preview-2024-12-17"
 BATCH_SIZE = 50
+MANIFEST_PATH = "manifests/segmented_audios.json"
+PAGE_INDEX_PATH = "manifests/bible_page_index.parquet"  # chapter/page sidecar of the Bible text
+PAGE_STORE_PATH = "manifests/transcription_pages.arrow"  # per-page inputs of the loky workers
+MANIFEST_TTL = 24 * 3600  # seconds
+PREFETCH_SEGMENTS = 2
+MAX_CONCURRENCY = 32  # API calls in flight for the async engine
+REQUESTS_PER_MINUTE = 500
+TOKENS_PER_MINUTE = 2_000_000
+JOURNAL_DIR = "journals/transcription_matching"
+RESPONSE_CACHE_DIR = "cache/llm_responses"
+RESPONSE_CACHE_MAX_BYTES = 2 * 1024**3
+RESPONSE_CACHE_S3_PREFIX = "cache/llm_responses"  # None to keep the cache local
+BATCH_WORK_DIR = "batches/transcription_matching"
+SEGMENTATION_MANIFEST_PATH = "manifests/segmentation_runs.json"  # local path and S3 key
+SILENCE_PARAMS_PATH = "manifests/silence_params.json"  # written by job_segmented_audios --tune
+PREFILTER_THRESHOLD = 80  # fuzz.ratio a local Whisper match needs to skip the audio model
+PREFILTER_WORKERS = 4  # loky workers with the Whisper prefilter: each loads its own model
+TRANSLATION_CACHE_DIR = "cache/translations"
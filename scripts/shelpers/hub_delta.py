@@ -0,0 +1,206 @@
+import os
+import re
+import uuid
+import shutil
+import hashlib
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from loguru import logger
+
+COLUMNS = ["french", "moore", "source"]
+DATA_DIR = "data"
+# One sidecar per data shard with the hashes of its rows, outside `data/`
+# so that it is not read as part of the dataset.
+HASH_INDEX_DIR = "hash_index"
+# Shards written by `append_rows`; `dataset_builder.push_partitions` absorbs
+# the rows that a rebuilt partition now holds.
+DELTA_SHARD_PATTERN = re.compile(rf"^{DATA_DIR}/train-delta-[^/]+\.parquet$")
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class LocalRepo:
+    """A local directory standing in for a Hub dataset repository."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def list_files(self):
+        """Returns {path_in_repo: sha256 of the content}."""
+        files = {}
+        for folder, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(folder, name)
+                files[os.path.relpath(path, self.root).replace(os.sep, "/")] = file_sha256(path)
+        return files
+
+    def download(self, path_in_repo):
+        return os.path.join(self.root, path_in_repo)
+
+    def commit(self, files, message, deletions=()):
+        """Adds `{path_in_repo: local_path}` to the repository and deletes `deletions`."""
+        for path_in_repo, local_path in files.items():
+            target = os.path.join(self.root, path_in_repo)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(local_path, f"{target}.tmp")
+            os.replace(f"{target}.tmp", target)
+        for path_in_repo in deletions:
+            os.remove(os.path.join(self.root, path_in_repo))
+        logger.info(
+            f"Committed {len(files)} files and {len(deletions)} deletions to {self.root}: {message}"
+        )
+
+
+class HubRepo:
+    """A Hugging Face Hub dataset repository."""
+
+    def __init__(self, repo_id, token=None):
+        from huggingface_hub import HfApi
+
+        self.repo_id = repo_id
+        self.token = token
+        self.api = HfApi(token=token)
+
+    def list_files(self):
+        """Returns {path_in_repo: sha256 of the content} (None for the non-LFS files)."""
+        return {
+            item.path: item.lfs.sha256 if item.lfs else None
+            for item in self.api.list_repo_tree(
+                self.repo_id, repo_type="dataset", recursive=True
+            )
+            if hasattr(item, "blob_id")
+        }
+
+    def download(self, path_in_repo):
+        from huggingface_hub import hf_hub_download
+
+        return hf_hub_download(
+            self.repo_id, path_in_repo, repo_type="dataset", token=self.token
+        )
+
+    def commit(self, files, message, deletions=()):
+        from huggingface_hub import CommitOperationAdd, CommitOperationDelete
+
+        self.api.create_commit(
+            repo_id=self.repo_id,
+            repo_type="dataset",
+            operations=[
+                CommitOperationAdd(path_in_repo=path_in_repo, path_or_fileobj=local_path)
+                for path_in_repo, local_path in files.items()
+            ]
+            + [CommitOperationDelete(path_in_repo=path_in_repo) for path_in_repo in deletions],
+            commit_message=message,
+        )
+        logger.info(
+            f"Committed {len(files)} files and {len(deletions)} deletions to {self.repo_id}: "
+            f"{message}"
+        )
+
+
+def row_hashes(df, columns=COLUMNS):
+    """Stable 64-bit hash of every row over `columns` (pandas' fixed-key siphash)."""
+    return pd.util.hash_pandas_object(
+        df[columns].astype("string").fillna(""), index=False
+    ).to_numpy()
+
+
+def hash_index_path(shard_path):
+    return f"{HASH_INDEX_DIR}/{os.path.basename(shard_path)}"
+
+
+def write_hash_index(hashes, shard_sha256, local_path):
+    """Writes a sidecar; the shard's sha256 is kept in the metadata to detect stale indexes."""
+    table = pa.table({"row_hash": pa.array(hashes, pa.uint64())}).replace_schema_metadata(
+        {"shard_sha256": shard_sha256 or ""}
+    )
+    pq.write_table(table, local_path)
+
+
+def load_existing_hashes(repo, files, work_dir):
+    """
+    Returns the hashes of every row already in the repository's data shards.
+
+    Shards with an up-to-date sidecar cost one small download; the others are
+    hashed once and their new sidecar is returned to be committed.
+
+    Returns:
+    - (array of row hashes, {path_in_repo: local_path} of the sidecars to commit)
+    """
+    existing, sidecars = [], {}
+    shards = [
+        path for path in files if path.startswith(f"{DATA_DIR}/") and path.endswith(".parquet")
+    ]
+    for shard in shards:
+        sidecar = hash_index_path(shard)
+        if sidecar in files:
+            table = pq.read_table(repo.download(sidecar))
+            metadata = table.schema.metadata or {}
+            if files[shard] and metadata.get(b"shard_sha256", b"").decode() == files[shard]:
+                existing.append(table.column("row_hash").to_numpy())
+                continue
+
+        logger.info(f"Indexing the rows of {shard}")
+        hashes = row_hashes(pd.read_parquet(repo.download(shard), columns=COLUMNS))
+        existing.append(hashes)
+        local_path = os.path.join(work_dir, sidecar)
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        write_hash_index(hashes, files[shard], local_path)
+        sidecars[sidecar] = local_path
+    return np.concatenate(existing) if existing else np.array([], np.uint64), sidecars
+
+
+def append_rows(repo, incoming, work_dir, commit_message):
+    """
+    Appends the rows of `incoming` that are not yet in the repository, as one new shard.
+
+    Only the new shard, its sidecar and the sidecars of shards indexed for
+    the first time are uploaded: the cost scales with the delta, not with
+    the corpus.
+
+    Parameters:
+    - repo: LocalRepo or HubRepo.
+    - incoming: DataFrame with the COLUMNS.
+    - work_dir: Local folder for the files to commit.
+    - commit_message: Message of the repository commit.
+
+    Returns:
+    - Number of rows appended.
+    """
+    files = repo.list_files()
+    existing, to_commit = load_existing_hashes(repo, files, work_dir)
+
+    incoming = incoming[COLUMNS].reset_index(drop=True)
+    hashes = row_hashes(incoming)
+    keep = ~pd.Series(hashes).duplicated().to_numpy() & ~np.isin(hashes, existing)
+    delta, delta_hashes = incoming[keep].reset_index(drop=True), hashes[keep]
+    logger.info(
+        f"{len(incoming)} incoming rows: {len(delta)} new, {len(incoming) - len(delta)} "
+        f"already in the dataset or duplicated ({len(existing)} rows indexed)"
+    )
+
+    if len(delta):
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        # The random suffix keeps two appends in the same second apart.
+        shard = f"{DATA_DIR}/train-delta-{stamp}-{uuid.uuid4().hex[:8]}.parquet"
+        local_shard = os.path.join(work_dir, shard)
+        os.makedirs(os.path.dirname(local_shard), exist_ok=True)
+        delta.to_parquet(local_shard, index=False)
+        local_sidecar = os.path.join(work_dir, hash_index_path(shard))
+        os.makedirs(os.path.dirname(local_sidecar), exist_ok=True)
+        write_hash_index(delta_hashes, file_sha256(local_shard), local_sidecar)
+        to_commit[shard] = local_shard
+        to_commit[hash_index_path(shard)] = local_sidecar
+
+    if to_commit:
+        repo.commit(to_commit, commit_message)
+    return len(delta)
@@ -0,0 +1,57 @@
+import os
+import json
+
+
+class PageJournal:
+    """
+    Append-only JSONL journal of the segments of one page.
+
+    Every processed segment appends one line with its result and the state of
+    the candidate window right after it, so that a rerun can skip the
+    segments already paid for and resume mid-page with the same window.
+    One file per page keeps the loky workers from writing to the same file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.records = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Last line truncated by a crash: the segment is redone.
+                        continue
+                    self.records[record["audio_path"]] = record
+
+    def __contains__(self, audio_path):
+        return audio_path in self.records
+
+    def __len__(self):
+        return len(self.records)
+
+    def result(self, audio_path):
+        """Returns the saved result of a segment, in the `process_single_page` format."""
+        record = self.records[audio_path]
+        return {key: record[key] for key in ("audio_path", "grade", "transcription")}
+
+    def window_state(self, audio_path):
+        return self.records[audio_path]["window"]
+
+    def append(self, result, window_state):
+        record = {**result, "window": window_state}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.records[result["audio_path"]] = record
+
+
+def open_page_journal(journal_dir, page_files, page_num):
+    """Returns the journal of a page, stored as `<journal_dir>/<chapter>/page_<n>.jsonl`."""
+    if not journal_dir or not page_files:
+        return None
+    chapter = page_files[0].split("/")[1]
+    return PageJournal(os.path.join(journal_dir, chapter, f"page_{page_num}.jsonl"))
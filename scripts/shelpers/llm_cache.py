@@ -0,0 +1,153 @@
+import os
+import json
+import hashlib
+import threading
+from botocore.exceptions import BotoCoreError, ClientError
+from loguru import logger
+
+
+class ResponseCache:
+    """
+    Content-addressed cache of model answers, stored as small JSON files.
+
+    Entries live under `<cache_dir>/<key[:2]>/<key>.json`. Reading an entry
+    touches its mtime so that, once the cache exceeds `max_bytes`, the least
+    recently used entries are evicted first. When an S3 client is given,
+    entries are mirrored to `s3://<bucket_name>/<s3_prefix>/` and local misses
+    are looked up there before calling the model.
+    """
+
+    def __init__(
+        self,
+        cache_dir,
+        max_bytes=2 * 1024**3,
+        s3_client=None,
+        bucket_name=None,
+        s3_prefix="cache/llm_responses",
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.s3_prefix = s3_prefix
+        self.hits = 0
+        self.s3_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._size = sum(size for _, _, size in self._entries())
+
+    @staticmethod
+    def make_key(*parts):
+        """sha256 of the JSON encoding of `parts`."""
+        payload = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _entries(self):
+        """Yields (path, mtime, size) of every cached entry."""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield entry.path, stat.st_mtime, stat.st_size
+
+    def get(self, key):
+        """Returns the cached value of `key`, or None."""
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                value = json.load(f)["value"]
+            os.utime(path)
+            with self._lock:
+                self.hits += 1
+            return value
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            pass
+
+        if self.s3_client is not None:
+            try:
+                body = self.s3_client.get_object(
+                    Bucket=self.bucket_name, Key=f"{self.s3_prefix}/{key}.json"
+                )["Body"].read()
+                value = json.loads(body)["value"]
+                self._write(key, value)
+                with self._lock:
+                    self.s3_hits += 1
+                return value
+            except self.s3_client.exceptions.NoSuchKey:
+                pass
+            except (ClientError, BotoCoreError, KeyError, json.JSONDecodeError) as e:
+                # The mirror is best effort: a failed lookup is a miss.
+                logger.warning(f"Response cache: S3 lookup of {key} failed: {e}")
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        payload = self._write(key, value)
+        if self.s3_client is not None:
+            try:
+                self.s3_client.put_object(
+                    Bucket=self.bucket_name,
+                    Key=f"{self.s3_prefix}/{key}.json",
+                    Body=payload,
+                )
+            except (ClientError, BotoCoreError) as e:
+                # The answer is already cached locally; only the mirror misses it.
+                logger.warning(f"Response cache: S3 write of {key} failed: {e}")
+
+    def _write(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        payload = json.dumps({"value": value}, ensure_ascii=False).encode("utf-8")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        try:
+            previous_size = os.path.getsize(path)
+        except FileNotFoundError:
+            previous_size = 0
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._size += len(payload) - previous_size
+            over_budget = self._size > self.max_bytes
+        if over_budget:
+            self.evict()
+        return payload
+
+    def evict(self):
+        """Deletes the least recently used entries until the cache is back to 90% of its budget."""
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda entry: entry[1])
+            size = sum(entry[2] for entry in entries)
+            target = 0.9 * self.max_bytes
+            evicted = 0
+            for path, _, entry_size in entries:
+                if size <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                size -= entry_size
+                evicted += 1
+            self._size = size
+        logger.info(f"Response cache: evicted {evicted} entries")
+
+    def summary(self):
+        lookups = self.hits + self.s3_hits + self.misses
+        hit_rate = (self.hits + self.s3_hits) / lookups if lookups else 0.0
+        return (
+            f"{self.hits} hits, {self.s3_hits} S3 hits, {self.misses} misses "
+            f"({hit_rate:.0%} hit rate)"
+        )
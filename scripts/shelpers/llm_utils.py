@@ -1,24 +1,37 @@
 import re
+import io
 import base64
+import hashlib
 import json
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from loguru import logger
 import os
 from .s3_utils import download_file_from_s3, upload_file_to_s3
-from .data_parser import splitter, flatten_nested_values
+from .data_parser import page_candidates
 from .path_collectors import get_page_segments
+from .journal import open_page_journal
+from .llm_cache import ResponseCache
 
 
+import numpy as np
 from rapidfuzz import fuzz, process
 
 
-def remove_similar_elements(input_list, elements_to_remove, threshold=85):
+def similarity_scores(input_list, elements, workers=-1):
+    """Best `fuzz.ratio` of each item of `input_list` against `elements`, in one cdist call."""
+    if not input_list or not elements:
+        return np.zeros(len(input_list))
+    return process.cdist(input_list, elements, scorer=fuzz.ratio, workers=workers).max(
+        axis=1
+    )
 
-    result = []
-    for item in input_list:
-        matches = process.extract(item, elements_to_remove, scorer=fuzz.ratio, limit=1)
-        if not matches or matches[0][1] < threshold:
-            result.append(item)
-    return result
+
+def remove_similar_elements(input_list, elements_to_remove, threshold=85, workers=-1):
+
+    keep = similarity_scores(input_list, elements_to_remove, workers) < threshold
+    return [item for item, kept in zip(input_list, keep) if kept]
 
 
 def audio_to_base64(audio_file_path):
@@ -31,8 +44,65 @@ def audio_to_base64(audio_file_path):
     return audio_base64
 
 
+_thread_buffers = threading.local()
+
+
+def download_audio_base64(s3_client, bucket_name, s3_key):
+    """Downloads a segment to the path of its key and returns it base64-encoded."""
+    download_file_from_s3(s3_client, bucket_name, s3_key, s3_key)
+    return audio_to_base64(s3_key)
+
+
+def fetch_audio_base64(s3_client, bucket_name, s3_key, buffer=None):
+    """
+    Reads an S3 object in memory and returns it base64-encoded, without any temp file.
+
+    The body is streamed into `buffer` (by default a per-thread BytesIO that is
+    reused from one segment to the next) and encoded straight from its memory.
+    """
+    if buffer is None:
+        buffer = getattr(_thread_buffers, "buffer", None)
+        if buffer is None:
+            buffer = _thread_buffers.buffer = io.BytesIO()
+    buffer.seek(0)
+    buffer.truncate()
+
+    body = s3_client.get_object(Bucket=bucket_name, Key=s3_key)["Body"]
+    for chunk in body.iter_chunks():
+        buffer.write(chunk)
+    with buffer.getbuffer() as view:
+        return base64.b64encode(view).decode("utf-8")
+
+
+def iter_audio_base64(s3_client, bucket_name, s3_keys, prefetch=2):
+    """
+    Yields the base64 audio of each key, in order.
+
+    With `prefetch > 0` the next `prefetch` segments are downloaded in
+    background threads while the caller is busy with the current one
+    (typically waiting for the LLM answer).
+    """
+    if prefetch <= 0:
+        for s3_key in s3_keys:
+            yield fetch_audio_base64(s3_client, bucket_name, s3_key)
+        return
+
+    s3_keys = iter(s3_keys)
+    with ThreadPoolExecutor(max_workers=prefetch) as executor:
+        pending = deque()
+        for s3_key in s3_keys:
+            pending.append(
+                executor.submit(fetch_audio_base64, s3_client, bucket_name, s3_key)
+            )
+            if len(pending) > prefetch:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
 def save_results(data, file_path):
     """Saves the results to a JSON file."""
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
     with open(file_path, "w", encoding="utf-8") as f:
         json.dump(data, f, ensure_ascii=False, indent=4)
 
@@ -43,6 +113,98 @@ def extract_xml_tag(content, tag):
     return match.group(1).strip() if match else None
 
 
+def parse_model_result(result):
+    """Returns the (transcription, grade) tags of a model answer."""
+    return extract_xml_tag(result, "output"), extract_xml_tag(result, "grade")
+
+
+def batch_result_paths(file):
+    """Local path and S3 key of the intermediate results saved after `file`."""
+    return f"{file}.json", f"model_transcription/{file}.json"
+
+
+def final_batch_paths(file, page_num):
+    """Local path and S3 key of the last results of a page."""
+    prefix = file.split("/")[1]
+    return (
+        f"{prefix}_{page_num}_final_batch.json",
+        f"model_transcription/aggregated/{prefix}/{page_num}_final_batch.json",
+    )
+
+
+def save_and_upload_results(s3_client, results, local_path, bucket_name, s3_key):
+    save_results(results, local_path)
+    upload_file_to_s3(s3_client, local_path, bucket_name, s3_key)
+
+
+class CandidateWindow:
+    """
+    Candidate verses offered to the model for the segments of one page.
+
+    The first `size` remaining verses are eligible; every `prune_every`
+    segments, the verses similar to what has been transcribed since the last
+    pruning are removed so the window moves forward through the page.
+
+    Each new transcription is scored against the surviving verses as soon as
+    it arrives and only the best score per verse is kept, so pruning is a
+    mask over those scores. `workers` is the rapidfuzz thread count; the
+    matrices are small and the engines already run pages concurrently.
+    """
+
+    def __init__(self, verses, size=10, prune_every=3, threshold=95, workers=1):
+        self.verses = list(verses)
+        self.size = size
+        self.prune_every = prune_every
+        self.threshold = threshold
+        self.workers = workers
+        self.pending = ""
+        self.seen = 0
+        self._best = np.zeros(len(self.verses))
+
+    def candidates(self):
+        return self.verses[: self.size]
+
+    def add(self, transcription):
+        """Registers the transcription of the next segment."""
+        self.seen += 1
+        self.pending = self.pending + "," + (transcription or "")
+        self._best = np.maximum(
+            self._best,
+            similarity_scores(
+                self.verses, string_to_list(transcription or ""), self.workers
+            ),
+        )
+        if self.seen % self.prune_every == 0:
+            keep = self._best < self.threshold
+            self.verses = [verse for verse, kept in zip(self.verses, keep) if kept]
+            self.pending = ""
+            self._best = np.zeros(len(self.verses))
+
+    def state(self):
+        return {"verses": self.verses, "pending": self.pending, "seen": self.seen}
+
+    def restore(self, state):
+        self.verses = list(state["verses"])
+        self.pending = state["pending"]
+        self.seen = state["seen"]
+        self._best = similarity_scores(
+            self.verses, string_to_list(self.pending), self.workers
+        )
+
+
+def build_page_candidates(page_num, tmp):
+    """
+    Returns the candidate verse fragments of a page.
+
+    `tmp` is either the verses dataframe or the `{page_num: candidates}`
+    precomputed for the chapter by `data_parser.page_candidates`, in which
+    case nothing is recomputed.
+    """
+    if isinstance(tmp, dict):
+        return list(tmp.get(page_num, []))
+    return page_candidates(tmp[tmp.page == page_num]).get(page_num, [])
+
+
 def string_to_list(input_text, preserve_delimiter=False):
     if preserve_delimiter:
         parts = input_text.split(",")
@@ -55,6 +217,33 @@ def string_to_list(input_text, preserve_delimiter=False):
         return [part.strip() for part in input_text.split(",") if part.strip()]
 
 
+def build_chat_with_audio_request(
+    query, input_audio_base64, model, system_prompt, audio_format="mp3"
+):
+    """Returns the keyword arguments of the chat completion sent by `chat_with_audio`."""
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": [{"type": "text", "text": system_prompt}]},
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": str(query)},
+                    {
+                        "type": "input_audio",
+                        "input_audio": {
+                            "data": input_audio_base64,
+                            "format": audio_format,
+                        },
+                    },
+                ],
+            },
+        ],
+        "modalities": ["text"],
+        "response_format": {"type": "text"},
+    }
+
+
 def chat_with_audio(
     client, query, input_audio_base64, model, system_prompt, audio_format="mp3"
 ):
@@ -73,29 +262,39 @@ def chat_with_audio(
     - The response from the OpenAI API.
     """
     response = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": [{"type": "text", "text": system_prompt}]},
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": str(query)},
-                    {
-                        "type": "input_audio",
-                        "input_audio": {
-                            "data": input_audio_base64,
-                            "format": audio_format,
-                        },
-                    },
-                ],
-            },
-        ],
-        modalities=["text"],
-        response_format={"type": "text"},
+        **build_chat_with_audio_request(
+            query, input_audio_base64, model, system_prompt, audio_format
+        )
     )
     return response
 
 
+def audio_cache_key(query, input_audio_base64, model, system_prompt):
+    """Cache key of a `chat_with_audio` call: audio content, candidates, prompt and model."""
+    audio_hash = hashlib.sha256(base64.b64decode(input_audio_base64)).hexdigest()
+    return ResponseCache.make_key(audio_hash, [str(item) for item in query], system_prompt, model)
+
+
+def chat_with_audio_cached(
+    client, query, input_audio_base64, model, system_prompt, cache=None
+):
+    """
+    Returns the text answer of `chat_with_audio`, served from `cache` when the
+    same audio was already sent with the same candidates, prompt and model.
+    """
+    if cache is None:
+        response = chat_with_audio(client, query, input_audio_base64, model, system_prompt)
+        return response.choices[0].message.content
+
+    key = audio_cache_key(query, input_audio_base64, model, system_prompt)
+    result = cache.get(key)
+    if result is None:
+        response = chat_with_audio(client, query, input_audio_base64, model, system_prompt)
+        result = response.choices[0].message.content
+        cache.put(key, result)
+    return result
+
+
 def process_single_page(
     page_num,
     tmp,
@@ -106,13 +305,19 @@ def process_single_page(
     MODEL_NAME,
     SYSTEM_PROMPT,
     BATCH_SIZE=50,
+    streaming=False,
+    prefetch=2,
+    journal_dir=None,
+    response_cache=None,
+    prefilter=None,
 ):
     """
     Process a single page for audio transcription and grading.
 
     Parameters:
     - page_num: The page number to process.
-    - tmp: The dataframe containing the page data.
+    - tmp: The dataframe containing the page data, or the precomputed
+      `{page_num: candidates}` of the chapter (see `build_page_candidates`).
     - files: List of files available for processing.
     - openai_client: The OpenAI client for interacting with the API.
     - S3_client:
@@ -120,69 +325,99 @@ def process_single_page(
     - MODEL_NAME: The model name for the OpenAI API.
     - SYSTEM_PROMPT: The system prompt for the OpenAI API.
     - BATCH_SIZE: Number of results to save per batch.
+    - streaming: Read the segments in memory with `get_object` instead of
+      downloading them to temporary files.
+    - prefetch: In streaming mode, number of upcoming segments downloaded in
+      the background while the current one is sent to the model.
+    - journal_dir: Folder of the per-page result journals. Segments already in
+      the journal are not sent again and the candidate window is restored.
+    - response_cache: Optional ResponseCache of the model answers.
+    - prefilter: Optional WhisperPrefilter. The page's segments are first
+      transcribed locally and only those without a confident candidate match
+      are sent to `chat_with_audio`.
 
     Returns:
     - results: List of dictionaries with audio transcription and grades.
     """
     results = []
-    tmp = tmp[tmp.page == page_num].reset_index(drop=True)
-    possible_values = tmp["moore_verse_text"].apply(splitter)
-    inputs = flatten_nested_values(possible_values)
+    inputs = build_page_candidates(page_num, tmp)
     page_files = get_page_segments(page_num, files)
 
-    verses = inputs.copy()
-    _transcription = ""
+    window = CandidateWindow(inputs)
+    journal = open_page_journal(journal_dir, page_files, page_num)
+    todo_files = [file for file in page_files if journal is None or file not in journal]
+    if journal:
+        logger.info(f"Page {page_num}: resuming after {len(journal)} journaled segments")
+
+    if streaming:
+        audios = iter_audio_base64(s3_client, BUCKET_NAME, todo_files, prefetch)
+    else:
+        audios = (
+            download_audio_base64(s3_client, BUCKET_NAME, file) for file in todo_files
+        )
+
+    if prefilter is not None:
+        # Whisper does not depend on the candidates: decode the page in batches.
+        accepted, escalated = prefilter.accepted, prefilter.escalated
+        audios = list(audios)
+        hypotheses = dict(zip(todo_files, prefilter.transcribe_many(audios)))
+        audios = iter(audios)
 
     for idx, file in enumerate(page_files, 1):
-        download_file_from_s3(s3_client, BUCKET_NAME, file, file)
-        audio_base64 = audio_to_base64(file)
+        if journal is not None and file in journal:
+            results.append(journal.result(file))
+            window.restore(journal.window_state(file))
+        else:
+            audio_base64 = next(audios)
 
-        # Use the first 10 verses as input.
-        elligible_candidates = verses[:10]
+            # Use the first 10 verses as input.
+            elligible_candidates = window.candidates()
 
-        response = chat_with_audio(
-            openai_client, elligible_candidates, audio_base64, MODEL_NAME, SYSTEM_PROMPT
-        )
-        result = response.choices[0].message.content
+            local_match = (
+                prefilter.match(hypotheses[file], elligible_candidates)
+                if prefilter is not None
+                else None
+            )
+            if local_match is not None:
+                transcription, grade = local_match, "1"
+                logger.info(f"local match: {local_match}")
+            else:
+                result = chat_with_audio_cached(
+                    openai_client,
+                    elligible_candidates,
+                    audio_base64,
+                    MODEL_NAME,
+                    SYSTEM_PROMPT,
+                    cache=response_cache,
+                )
 
-        transcription = extract_xml_tag(result, "output")
-        grade = extract_xml_tag(result, "grade")
-        logger.info(f"model result: {result}")
+                transcription, grade = parse_model_result(result)
+                logger.info(f"model result: {result}")
 
-        results.append(
-            {
+            record = {
                 "audio_path": file,
                 "grade": grade,
                 "transcription": transcription,
             }
-        )
-        _transcription = _transcription + "," + transcription
-        if idx % 3 == 0:
-            verses = remove_similar_elements(
-                verses, string_to_list(_transcription), threshold=95
-            )
-            _transcription = ""
+            results.append(record)
+            window.add(transcription)
+            if journal is not None:
+                journal.append(record, window.state())
 
         # Save results every BATCH_SIZE files.
         if idx % BATCH_SIZE == 0:
-            save_results(results, f"{file}.json")
-            upload_file_to_s3(
-                s3_client,
-                f"{file}.json",
-                BUCKET_NAME,
-                f"model_transcription/{file}.json",
-            )
+            local_path, s3_key = batch_result_paths(file)
+            save_and_upload_results(s3_client, results, local_path, BUCKET_NAME, s3_key)
             results = []  # Reset results after saving
 
     # Save remaining results after processing all files.
     if results:
-        prefix = file.split("/")[1]
-        save_results(results, f"{prefix}_{page_num}_final_batch.json")
-        upload_file_to_s3(
-            s3_client,
-            f"{prefix}_{page_num}_final_batch.json",
-            BUCKET_NAME,
-            f"model_transcription/aggregated/{prefix}/{page_num}_final_batch.json",
-        )
+        local_path, s3_key = final_batch_paths(file, page_num)
+        save_and_upload_results(s3_client, results, local_path, BUCKET_NAME, s3_key)
 
+    if prefilter is not None:
+        logger.info(
+            f"Page {page_num}: {prefilter.accepted - accepted} segments matched locally, "
+            f"{prefilter.escalated - escalated} escalated. {prefilter.summary()}"
+        )
     return results
@@ -0,0 +1,105 @@
+"""
+Worker side of the loky engine of `job_transcription_matching`.
+
+These functions live in an importable module so that loky pickles them by
+reference: the initializer and the tasks of a worker process then share the
+same module globals, so the page store, the clients and the Whisper models
+are loaded once per worker.
+"""
+import os
+from loguru import logger
+from openai import OpenAI
+
+from .global_vars import (
+    BUCKET_NAME,
+    JOURNAL_DIR,
+    PREFETCH_SEGMENTS,
+    PREFILTER_THRESHOLD,
+    RESPONSE_CACHE_DIR,
+    RESPONSE_CACHE_MAX_BYTES,
+    RESPONSE_CACHE_S3_PREFIX,
+)
+from .llm_cache import ResponseCache
+from .llm_utils import process_single_page
+from .page_index import PageStore
+from .path_collectors import SegmentIndex
+from .s3_utils import get_s3_client
+from .whisper_prefilter import WhisperPrefilter
+
+# Whisper models of this worker process, loaded once and reused across its pages.
+_prefilters = {}
+
+# Read-only state of this worker process, set once by `init_worker`.
+_worker = {}
+
+
+def get_response_cache(s3_client):
+    """Local response cache, mirrored to S3 when RESPONSE_CACHE_S3_PREFIX is set."""
+    return ResponseCache(
+        RESPONSE_CACHE_DIR,
+        max_bytes=RESPONSE_CACHE_MAX_BYTES,
+        s3_client=s3_client if RESPONSE_CACHE_S3_PREFIX else None,
+        bucket_name=BUCKET_NAME,
+        s3_prefix=RESPONSE_CACHE_S3_PREFIX,
+    )
+
+
+def get_prefilter(model_name):
+    if model_name not in _prefilters:
+        _prefilters[model_name] = WhisperPrefilter(model_name, threshold=PREFILTER_THRESHOLD)
+    return _prefilters[model_name]
+
+
+def init_worker(store_path, prefilter_model=None):
+    """
+    Opens the memory-mapped page store and the clients shared by the worker's pages.
+
+    With a Whisper prefilter, torch is limited to one thread per worker:
+    each model would otherwise start a thread per core in every worker.
+    """
+    if prefilter_model:
+        import torch
+
+        torch.set_num_threads(1)
+    _worker["store"] = PageStore.open(store_path)
+    _worker["s3_client"] = get_s3_client()
+    _worker["openai_client"] = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    _worker["response_cache"] = get_response_cache(_worker["s3_client"])
+
+
+def page_inputs(chapter, page_num):
+    """Returns the `{page_num: candidates}` and SegmentIndex of one page, from the store."""
+    candidates, segments = _worker["store"].page(chapter, page_num)
+    return {page_num: candidates}, SegmentIndex.from_pages({page_num: segments})
+
+
+def process_page(
+    chapter, page_num, BUCKET_NAME, MODEL_NAME, SYSTEM_PROMPT, BATCH_SIZE, prefilter_model=None
+):
+    try:
+        logger.info(f"Processing page {page_num}")
+        candidates, files = page_inputs(chapter, page_num)
+        response_cache = _worker["response_cache"]
+
+        result = process_single_page(
+            page_num,
+            candidates,
+            files,
+            _worker["openai_client"],
+            _worker["s3_client"],
+            BUCKET_NAME,
+            MODEL_NAME,
+            SYSTEM_PROMPT,
+            BATCH_SIZE,
+            streaming=True,
+            prefetch=PREFETCH_SEGMENTS,
+            journal_dir=JOURNAL_DIR,
+            response_cache=response_cache,
+            prefilter=get_prefilter(prefilter_model) if prefilter_model else None,
+        )
+        logger.info(f"Worker response cache after page {page_num}: {response_cache.summary()}")
+        logger.info(f"Page {page_num} processed successfully.")
+        return result
+    except Exception as e:
+        logger.error(f"Error processing page {page_num}: {e}")
+        return None
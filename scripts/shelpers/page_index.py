@@ -0,0 +1,167 @@
+import os
+import hashlib
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from loguru import logger
+
+from .data_parser import parse_audio_identifiers
+
+KEYS = ["chapter", "page"]
+
+
+class PageIndex:
+    """
+    Verses of the Bible text dataset sorted by (chapter, page), with the row
+    offsets of every page.
+
+    A page is a positional slice of the sorted frame, so looking one up does
+    not scan the dataset. Parsing the source URLs is the slow part of loading
+    the dataset, so the sorted frame is saved as a parquet sidecar tagged
+    with the fingerprint of the dataset it was built from.
+    """
+
+    def __init__(self, data, fingerprint=None):
+        self.data = data
+        self.fingerprint = fingerprint
+        # The frame is sorted, so every page is one run of rows and the groups
+        # come in row order: their sizes add up to the page offsets.
+        sizes = data.groupby(KEYS, sort=False).size()
+        stops = sizes.cumsum().tolist()
+        self._offsets = {
+            (chapter, int(page_num)): (stop - size, stop)
+            for (chapter, page_num), size, stop in zip(sizes.index, sizes.tolist(), stops)
+        }
+
+    @classmethod
+    def build(cls, data, fingerprint=None, url_column="moore_source_url"):
+        """Parses the chapter and page of every verse and sorts the verses by page."""
+        data = data.drop(columns=KEYS, errors="ignore")
+        data = pd.concat([data, parse_audio_identifiers(data[url_column])], axis=1)
+        # A stable sort keeps the verses of a page in their dataset order.
+        data = data.sort_values(KEYS, kind="stable", ignore_index=True)
+        return cls(data, fingerprint)
+
+    @classmethod
+    def load(cls, path, fingerprint=None):
+        """Returns the saved index, or None if it is missing or was built from other data."""
+        if not os.path.exists(path):
+            return None
+        table = pq.read_table(path)
+        saved = (table.schema.metadata or {}).get(b"fingerprint", b"").decode()
+        if fingerprint is not None and saved != fingerprint:
+            logger.info(f"Page index {path} is stale, rebuilding it")
+            return None
+        return cls(table.to_pandas(), saved or None)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        table = pa.Table.from_pandas(self.data, preserve_index=False)
+        table = table.replace_schema_metadata(
+            {**(table.schema.metadata or {}), b"fingerprint": (self.fingerprint or "").encode()}
+        )
+        pq.write_table(table, f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def keys(self):
+        """(chapter, page) of every page, in index order."""
+        return list(self._offsets)
+
+    def page(self, chapter, page_num):
+        """Verses of one page (an empty frame for an unknown page)."""
+        start, stop = self._offsets.get((chapter, int(page_num)), (0, 0))
+        return self.data.iloc[start:stop]
+
+
+def dataset_fingerprint(dataset):
+    """
+    sha256 of the names, sizes and mtimes of the Arrow cache files of a
+    `Dataset`, or None for an in-memory dataset.
+    """
+    if not dataset.cache_files:
+        return None
+    digest = hashlib.sha256()
+    for cache_file in sorted(dataset.cache_files, key=lambda cache_file: cache_file["filename"]):
+        stat = os.stat(cache_file["filename"])
+        digest.update(f"{cache_file['filename']}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def load_page_index(dataset, path):
+    """
+    Returns the PageIndex of a Hugging Face `Dataset`, from its sidecar when
+    the dataset has not changed, otherwise built and saved to `path`.
+    """
+    fingerprint = dataset_fingerprint(dataset)
+    index = PageIndex.load(path, fingerprint) if fingerprint else None
+    if index is None:
+        index = PageIndex.build(dataset.to_pandas(), fingerprint)
+        index.save(path)
+        logger.info(f"Page index of {len(index)} pages saved to {path}")
+    return index
+
+
+class PageStore:
+    """
+    Read-only inputs of the matching tasks, one row per page: its candidate
+    fragments and its ordered segment keys, in an Arrow IPC file.
+
+    The file is memory-mapped, so every worker process opens it once and
+    shares the same pages of memory; a task only needs its (chapter, page).
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self._rows = {
+            (chapter, page): row
+            for row, (chapter, page) in enumerate(
+                zip(table.column("chapter").to_pylist(), table.column("page").to_pylist())
+            )
+        }
+
+    @staticmethod
+    def write(path, pages):
+        """
+        Writes the store.
+
+        Parameters:
+        - path: Arrow IPC file to write.
+        - pages: Iterable of (chapter, page, candidates, segment keys).
+        """
+        chapters, page_nums, candidates, segments = [], [], [], []
+        for chapter, page_num, page_candidates, page_segments in pages:
+            chapters.append(chapter)
+            page_nums.append(int(page_num))
+            candidates.append(page_candidates)
+            segments.append(page_segments)
+        table = pa.table(
+            {
+                "chapter": pa.array(chapters, pa.string()),
+                "page": pa.array(page_nums, pa.int64()),
+                "candidates": pa.array(candidates, pa.list_(pa.string())),
+                "segments": pa.array(segments, pa.list_(pa.string())),
+            }
+        )
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with pa.OSFile(f"{path}.tmp", "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def open(cls, path):
+        return cls(pa.ipc.open_file(pa.memory_map(path, "r")).read_all())
+
+    def __len__(self):
+        return len(self._rows)
+
+    def keys(self):
+        return list(self._rows)
+
+    def page(self, chapter, page_num):
+        """Returns (candidates, segment keys) of one page."""
+        row = self.table.slice(self._rows[(chapter, int(page_num))], 1)
+        return row.column("candidates")[0].as_py(), row.column("segments")[0].as_py()
@@ -1,4 +1,78 @@
 import re
+from collections import defaultdict
+
+# <source_folder>/<chapter>/page_<page>/segment_<segment>.mp3
+SEGMENT_KEY_PATTERN = re.compile(
+    r"(?:^|/)(?P<chapter>[^/]+)/page_(?P<page>\d+)/segment_(?P<segment>\d+)\.mp3$"
+)
+
+
+def parse_segment_key(key):
+    """Returns (chapter, page, segment) for a segment key, or None if it is not one."""
+    match = SEGMENT_KEY_PATTERN.search(key)
+    if not match:
+        return None
+    return match.group("chapter"), int(match.group("page")), int(match.group("segment"))
+
+
+# <source_folder>/<chapter>\page_<page>.mp3, the raw files keep a Windows separator.
+SOURCE_KEY_PATTERN = re.compile(r"(?P<chapter>[^/\\]+)[/\\]page_(?P<page>\d+)\.mp3$")
+
+
+def parse_source_key(key):
+    """Returns (chapter, page) for a raw page audio key, or None if it is not one."""
+    match = SOURCE_KEY_PATTERN.search(key)
+    if not match:
+        return None
+    return match.group("chapter"), int(match.group("page"))
+
+
+# Segments 1-3 are dropped by name, then the next 3 remaining ones (introduction).
+INTRO_SEGMENT_NAMES = 3
+INTRO_SEGMENTS_SKIPPED = 3
+
+
+class SegmentIndex:
+    """
+    Page -> ordered segment keys of one chapter, built with a single pass over its files.
+
+    Pages are matched on the parsed page number, so `page_1/` and `page_11/`
+    can no longer be confused.
+    """
+
+    def __init__(self, files):
+        pages = defaultdict(list)
+        for file in files:
+            parsed = parse_segment_key(file)
+            if parsed:
+                _, page, segment = parsed
+                pages[page].append((segment, file))
+
+        self._pages = {
+            page: [
+                file
+                for segment, file in sorted(segments)
+                if segment > INTRO_SEGMENT_NAMES
+            ][INTRO_SEGMENTS_SKIPPED:]
+            for page, segments in pages.items()
+        }
+
+    @classmethod
+    def from_pages(cls, pages):
+        """Builds an index from already ordered and filtered `{page: segment keys}`."""
+        index = cls([])
+        index._pages = {int(page): list(segments) for page, segments in pages.items()}
+        return index
+
+    def __len__(self):
+        return len(self._pages)
+
+    def pages(self):
+        return sorted(self._pages)
+
+    def page_segments(self, page_num):
+        """Returns the ordered, intro-filtered segments of a page."""
+        return list(self._pages.get(int(page_num), []))
 
 
 def extract_segment_number(filename):
@@ -9,7 +83,12 @@ def extract_segment_number(filename):
 def get_page_segments(page_num, files):
     """
     Returns a list of files for a specific page, excluding files with specified suffixes of introduction
+
+    `files` may be a prebuilt SegmentIndex, in which case the lookup is O(1).
     """
+    if isinstance(files, SegmentIndex):
+        return files.page_segments(page_num)
+
     suffixes = ["segment_1.mp3", "segment_2.mp3", "segment_3.mp3"]
 
     files_page = [file for file in files if f"page_{page_num}/" in file]
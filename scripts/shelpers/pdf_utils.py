@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+from pdf2image import convert_from_path, pdfinfo_from_path
+
+
+def page_image_path(output_folder, page):
+    return os.path.join(output_folder, f"page_{page}.jpg")
+
+
+def _page_chunks(pages, chunk_size):
+    """Splits sorted page numbers into contiguous (first, last) ranges of at most `chunk_size`."""
+    chunks = []
+    for page in pages:
+        if chunks and page == chunks[-1][1] + 1 and page - chunks[-1][0] < chunk_size:
+            chunks[-1][1] = page
+        else:
+            chunks.append([page, page])
+    return [tuple(chunk) for chunk in chunks]
+
+
+def _render_chunk(pdf_path, output_folder, first_page, last_page, dpi, poppler_path):
+    """
+    Renders a page range straight to `page_<n>.jpg` files.
+
+    pdftoppm writes the JPEGs itself and `paths_only` keeps pdf2image from
+    loading them back as PIL images, so a page is written once and never
+    held in memory.
+    """
+    with tempfile.TemporaryDirectory(dir=output_folder) as tmp_folder:
+        paths = convert_from_path(
+            pdf_path,
+            dpi=dpi,
+            output_folder=tmp_folder,
+            first_page=first_page,
+            last_page=last_page,
+            fmt="jpeg",
+            output_file="page",
+            paths_only=True,
+            poppler_path=poppler_path,
+        )
+        rendered = []
+        for page, path in zip(range(first_page, last_page + 1), sorted(paths)):
+            target = page_image_path(output_folder, page)
+            shutil.move(path, target)
+            rendered.append(target)
+    return rendered
+
+
+def iter_pdf_pages(
+    pdf_path, output_folder, dpi=300, chunk_size=8, max_workers=None, poppler_path=None, force=False
+):
+    """
+    Rasterises a PDF to `<output_folder>/page_<n>.jpg`, yielding the page paths in page order.
+
+    Pages already rendered by a previous run are not rendered again. The
+    missing pages are split into `chunk_size` ranges rendered by parallel
+    pdftoppm processes, all submitted up front; each page is yielded as soon
+    as it and the pages before it exist, so a consumer (e.g. the OCR pool of
+    `run_page_extraction`) can start on the first pages while the rest of
+    the document is still being rasterised, and always sees the same order.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    n_pages = pdfinfo_from_path(pdf_path, poppler_path=poppler_path)["Pages"]
+    missing = [
+        page
+        for page in range(1, n_pages + 1)
+        if force or not os.path.exists(page_image_path(output_folder, page))
+    ]
+    logger.info(f"{pdf_path}: {n_pages - len(missing)} pages already rendered, {len(missing)} to render")
+
+    max_workers = max_workers or os.cpu_count()
+    missing_pages = set(missing)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Chunk futures keyed by their first page.
+        chunks = {
+            first: executor.submit(
+                _render_chunk, pdf_path, output_folder, first, last, dpi, poppler_path
+            )
+            for first, last in _page_chunks(missing, chunk_size)
+        }
+        for page in range(1, n_pages + 1):
+            if page in chunks:
+                yield from chunks[page].result()
+            elif page not in missing_pages:
+                yield page_image_path(output_folder, page)
+
+
+def rasterise_pdf(pdf_path, output_folder, on_page=None, **kwargs):
+    """
+    Rasterises every page of a PDF (see `iter_pdf_pages`).
+
+    Parameters:
+    - on_page: Optional callback called with each page path as soon as it is rendered.
+
+    Returns:
+    - Page image paths, in page order.
+    """
+    paths = []
+    for path in iter_pdf_pages(pdf_path, output_folder, **kwargs):
+        if on_page is not None:
+            on_page(path)
+        paths.append(path)
+    return sorted(paths, key=lambda path: int(path.rsplit("_", 1)[-1].split(".")[0]))
@@ -0,0 +1,49 @@
+import time
+import threading
+
+
+class StageMetrics:
+    """Thread-safe throughput and latency counters of one pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.failed = 0
+        self.busy = 0.0
+        self.max_latency = 0.0
+        self.bytes = 0
+        self.started_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, latency, ok=True, nbytes=0):
+        with self._lock:
+            if ok:
+                self.items += 1
+                self.bytes += nbytes
+            else:
+                self.failed += 1
+            self.busy += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def summary(self):
+        elapsed = time.monotonic() - self.started_at
+        done = self.items + self.failed
+        return (
+            f"{self.name}: {self.items} ok, {self.failed} failed, "
+            f"{self.items / elapsed if elapsed else 0:.2f} items/s, "
+            f"{self.bytes / elapsed / 1e6 if elapsed else 0:.2f} MB/s, "
+            f"mean latency {self.busy / done if done else 0:.2f}s, "
+            f"max {self.max_latency:.2f}s"
+        )
+
+
+class Timer:
+    """Context manager measuring the duration of a block, in seconds."""
+
+    def __enter__(self):
+        self.started_at = time.monotonic()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.monotonic() - self.started_at
+        return False
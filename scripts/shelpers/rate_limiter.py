@@ -0,0 +1,124 @@
+import time
+import asyncio
+import threading
+from openai import (
+    RateLimitError,
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+)
+
+# OpenAI errors worth retrying with backoff.
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+
+def retry_after(error):
+    """Delay advertised by the `retry-after` header of an API error, or None."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBuckets:
+    """
+    Requests-per-minute and tokens-per-minute budgets, as token buckets
+    refilled continuously, plus a pause that a 429 imposes on every caller.
+
+    Holds the bookkeeping only; `RateLimiter` and `AsyncRateLimiter` add the
+    waiting, with a thread lock or an asyncio lock.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute=None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute or 0)
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed_minutes = (now - self._updated_at) / 60
+        self._updated_at = now
+        self._requests = min(
+            self.requests_per_minute,
+            self._requests + elapsed_minutes * self.requests_per_minute,
+        )
+        if self.tokens_per_minute:
+            self._tokens = min(
+                self.tokens_per_minute,
+                self._tokens + elapsed_minutes * self.tokens_per_minute,
+            )
+
+    def _take(self, tokens):
+        """Takes a request and `tokens` if the budgets allow, else returns the seconds to wait."""
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            return pause
+
+        self._refill()
+        # A request larger than the whole budget only waits for a full bucket.
+        tokens_needed = min(tokens, self.tokens_per_minute or 0)
+        if self._requests >= 1 and self._tokens >= tokens_needed:
+            self._requests -= 1
+            self._tokens -= tokens if self.tokens_per_minute else 0
+            return 0
+
+        wait = (1 - self._requests) * 60 / self.requests_per_minute
+        if self.tokens_per_minute:
+            wait = max(wait, (tokens_needed - self._tokens) * 60 / self.tokens_per_minute)
+        return max(wait, 0.01)
+
+    def consume(self, tokens):
+        """Charges the difference between the estimated and the actual token usage."""
+        if self.tokens_per_minute:
+            self._tokens -= tokens
+
+    def pause(self, seconds):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class RateLimiter(TokenBuckets):
+    """Budget shared by the threads of a pool; waiters are served in arrival order."""
+
+    def __init__(self, requests_per_minute, tokens_per_minute=None):
+        super().__init__(requests_per_minute, tokens_per_minute)
+        # `_lock` guards the buckets; `_turn` is held while sleeping, which
+        # serves the threads in arrival order without blocking `pause` or
+        # `consume` for the length of a wait.
+        self._lock = threading.Lock()
+        self._turn = threading.Lock()
+
+    def acquire(self, tokens=0):
+        with self._turn:
+            while True:
+                with self._lock:
+                    wait = self._take(tokens)
+                if not wait:
+                    return
+                time.sleep(wait)
+
+    def consume(self, tokens):
+        with self._lock:
+            super().consume(tokens)
+
+    def pause(self, seconds):
+        with self._lock:
+            super().pause(seconds)
+
+
+class AsyncRateLimiter(TokenBuckets):
+    """Budget shared by all coroutines; waiters are served in arrival order."""
+
+    def __init__(self, requests_per_minute, tokens_per_minute=None):
+        super().__init__(requests_per_minute, tokens_per_minute)
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens=0):
+        async with self._lock:
+            while wait := self._take(tokens):
+                await asyncio.sleep(wait)
@@ -0,0 +1,191 @@
+import os
+import json
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+
+from .path_collectors import parse_segment_key, SegmentIndex
+
+
+def _object_record(obj):
+    return {
+        "key": obj["Key"],
+        "size": obj["Size"],
+        "etag": obj["ETag"].strip('"'),
+        "mtime": obj["LastModified"].isoformat(),
+    }
+
+
+def list_s3_objects(s3_client, bucket_name, prefix, delimiter=None):
+    """
+    List objects (key, size, ETag, mtime) under a prefix with one paginated scan.
+
+    When `delimiter` is given, also returns the common prefixes found one level
+    below `prefix`; otherwise the second element is an empty list.
+    """
+    paginator = s3_client.get_paginator("list_objects_v2")
+    kwargs = {"Bucket": bucket_name, "Prefix": prefix}
+    if delimiter:
+        kwargs["Delimiter"] = delimiter
+
+    objects, prefixes = [], []
+    for page in paginator.paginate(**kwargs):
+        objects.extend(_object_record(obj) for obj in page.get("Contents", []))
+        prefixes.extend(p["Prefix"] for p in page.get("CommonPrefixes", []))
+    return objects, prefixes
+
+
+def list_s3_objects_sharded(s3_client, bucket_name, prefix, max_workers=16):
+    """
+    List a prefix by first discovering its sub-prefixes (one per chapter for the
+    segmented audios) and then listing each of them concurrently.
+    """
+    root = prefix.rstrip("/") + "/"
+    objects, shards = list_s3_objects(s3_client, bucket_name, root, delimiter="/")
+    logger.info(f"Listing {len(shards)} shards under s3://{bucket_name}/{root}")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for shard_objects, _ in executor.map(
+            lambda shard: list_s3_objects(s3_client, bucket_name, shard), shards
+        ):
+            objects.extend(shard_objects)
+    return objects
+
+
+class S3Manifest:
+    """
+    In-memory view of a listing, indexed by chapter / page / segment number.
+    """
+
+    def __init__(self, bucket_name, prefix, objects, listed_at=None):
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+        self.listed_at = listed_at if listed_at is not None else time.time()
+        self.objects = {obj["key"]: obj for obj in objects}
+
+        self.index = defaultdict(lambda: defaultdict(dict))
+        for key in self.objects:
+            parsed = parse_segment_key(key)
+            if parsed:
+                chapter, page, segment = parsed
+                self.index[chapter][page][segment] = key
+
+    def __len__(self):
+        return len(self.objects)
+
+    def keys(self):
+        return list(self.objects)
+
+    @property
+    def age(self):
+        return time.time() - self.listed_at
+
+    def chapters(self):
+        return list(self.index)
+
+    def keys_by_chapter(self):
+        """Returns {chapter: [keys]}, the shape of the former `segment_path_dict`."""
+        return {
+            chapter: [key for segments in pages.values() for key in segments.values()]
+            for chapter, pages in self.index.items()
+        }
+
+    def segment_index(self, chapter):
+        """Returns the SegmentIndex of one chapter."""
+        return SegmentIndex(
+            key for segments in self.index.get(chapter, {}).values() for key in segments.values()
+        )
+
+    def segment_key(self, chapter, page, segment):
+        return self.index.get(chapter, {}).get(page, {}).get(segment)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "bucket": self.bucket_name,
+                    "prefix": self.prefix,
+                    "listed_at": self.listed_at,
+                    "objects": list(self.objects.values()),
+                },
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+        return cls(
+            payload["bucket"], payload["prefix"], payload["objects"], payload["listed_at"]
+        )
+
+
+def diff_manifests(old, new):
+    """Returns (added, changed, removed) keys between two manifests, using the ETags."""
+    added = [key for key in new.objects if key not in old.objects]
+    removed = [key for key in old.objects if key not in new.objects]
+    changed = [
+        key
+        for key, obj in new.objects.items()
+        if key in old.objects and old.objects[key]["etag"] != obj["etag"]
+    ]
+    return added, changed, removed
+
+
+def load_s3_manifest(
+    s3_client,
+    bucket_name,
+    prefix,
+    cache_path,
+    ttl=24 * 3600,
+    sharded=True,
+    max_workers=16,
+    force_refresh=False,
+):
+    """
+    Returns the manifest of `prefix`, listing the bucket only when needed.
+
+    Parameters:
+    - s3_client: The boto3 S3 client.
+    - bucket_name: The name of the S3 bucket.
+    - prefix: The prefix to list, e.g. `segmented_audios`.
+    - cache_path: Local JSON file where the manifest is persisted.
+    - ttl: Maximum age in seconds of a cached manifest before it is refreshed.
+    - sharded: List the sub-prefixes concurrently instead of one long scan.
+    - max_workers: Number of concurrent shard listings.
+    - force_refresh: Ignore the cached manifest.
+
+    Returns:
+    - S3Manifest
+    """
+    cached = None
+    if os.path.exists(cache_path):
+        cached = S3Manifest.load(cache_path)
+        stale = cached.bucket_name != bucket_name or cached.prefix != prefix
+        if not (force_refresh or stale) and cached.age < ttl:
+            logger.info(
+                f"Using cached manifest {cache_path} ({len(cached)} objects, {cached.age:.0f}s old)"
+            )
+            return cached
+        if stale:
+            cached = None
+
+    if sharded:
+        objects = list_s3_objects_sharded(s3_client, bucket_name, prefix, max_workers)
+    else:
+        objects, _ = list_s3_objects(s3_client, bucket_name, prefix)
+    manifest = S3Manifest(bucket_name, prefix, objects)
+
+    if cached is not None:
+        added, changed, removed = diff_manifests(cached, manifest)
+        logger.info(
+            f"Manifest refreshed: {len(added)} added, {len(changed)} changed, {len(removed)} removed"
+        )
+    manifest.save(cache_path)
+    logger.info(f"Listed {len(manifest)} objects under s3://{bucket_name}/{prefix}")
+    return manifest
@@ -1,6 +1,38 @@
 import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional, Tuple
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from loguru import logger
 
+# Small segment files: one request per object, the parallelism comes from the pool.
+_SINGLE_THREAD_TRANSFER = TransferConfig(use_threads=False)
+
+
+def get_s3_client(max_pool_connections=50, max_attempts=5):
+    """
+    Create an S3 client sized for concurrent transfers.
+
+    boto3 clients are thread-safe, so one client (and its connection pool) is
+    meant to be shared by every worker thread of `upload_many` / `download_many`.
+    Credentials and endpoint are read from the usual AWS environment variables.
+    """
+    return boto3.client(
+        "s3",
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+        endpoint_url=os.getenv("AWS_ENDPOINT_URL_S3"),
+        config=Config(
+            max_pool_connections=max_pool_connections,
+            retries={"max_attempts": max_attempts, "mode": "standard"},
+        ),
+    )
+
 
 def upload_file_to_s3(s3_client, local_path, bucket_name, s3_key):
     """Upload a single file to S3."""
@@ -24,3 +56,171 @@ def list_s3_files(s3_client, bucket_name, prefix):
         for obj in page.get("Contents", []):
             files.append(obj["Key"])
     return files
+
+
+@dataclass
+class TransferResult:
+    """Outcome of one object transfer in `upload_many` / `download_many`."""
+
+    local_path: str
+    s3_key: str
+    ok: bool
+    nbytes: int = 0
+    attempts: int = 0
+    error: Optional[str] = None
+
+
+class TransferStats:
+    """Thread-safe byte/object counters shared by the transfer workers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.monotonic()
+        self.objects = 0
+        self.failed = 0
+        self.retries = 0
+        self.bytes = 0
+
+    def record(self, result):
+        with self._lock:
+            if result.ok:
+                self.objects += 1
+                self.bytes += result.nbytes
+            else:
+                self.failed += 1
+            self.retries += max(result.attempts - 1, 0)
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started_at
+
+    @property
+    def throughput(self):
+        """Bytes per second since the counters were created."""
+        return self.bytes / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self):
+        return (
+            f"{self.objects} objects ({self.bytes / 1e6:.1f} MB) in {self.elapsed:.1f}s, "
+            f"{self.throughput / 1e6:.2f} MB/s, {self.failed} failed, {self.retries} retries"
+        )
+
+
+def _transfer_with_retry(transfer, local_path, s3_key, retries, backoff):
+    """Run `transfer()` up to `retries` times and return a TransferResult."""
+    for attempt in range(1, retries + 1):
+        try:
+            nbytes = transfer()
+            return TransferResult(local_path, s3_key, True, nbytes, attempt)
+        except Exception as e:
+            if attempt == retries:
+                logger.warning(f"Transfer of {s3_key} failed after {attempt} attempts: {e}")
+                return TransferResult(local_path, s3_key, False, 0, attempt, str(e))
+            time.sleep(backoff * 2 ** (attempt - 1))
+
+
+def _run_transfers(make_transfer, items, max_workers, retries, backoff, stats):
+    """
+    Feed `items` to a bounded thread pool and yield results as they complete.
+
+    At most `2 * max_workers` transfers are in flight, so arbitrarily long
+    iterables (tens of thousands of segments) are never materialised.
+    """
+    stats = stats if stats is not None else TransferStats()
+    max_in_flight = 2 * max_workers
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < max_in_flight:
+                try:
+                    local_path, s3_key = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.add(
+                    executor.submit(
+                        _transfer_with_retry,
+                        make_transfer(local_path, s3_key),
+                        local_path,
+                        s3_key,
+                        retries,
+                        backoff,
+                    )
+                )
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                stats.record(result)
+                yield result
+    logger.info(f"Transfers done: {stats.summary()}")
+
+
+def upload_many(
+    s3_client,
+    bucket_name,
+    items: Iterable[Tuple[str, str]],
+    max_workers=16,
+    retries=3,
+    backoff=1.0,
+    stats: Optional[TransferStats] = None,
+) -> Iterator[TransferResult]:
+    """
+    Upload many files concurrently over one shared client.
+
+    Args:
+        s3_client: boto3 S3 client, ideally from `get_s3_client` so that its
+            connection pool is at least `max_workers` wide.
+        bucket_name (str): Destination bucket.
+        items: Iterable of `(local_path, s3_key)` pairs.
+        max_workers (int): Number of concurrent transfers.
+        retries (int): Attempts per object before it is reported as failed.
+        backoff (float): Base delay in seconds of the exponential backoff.
+        stats (TransferStats): Optional counters to update.
+
+    Yields:
+        TransferResult: One per item, in completion order.
+    """
+
+    def make_transfer(local_path, s3_key):
+        def transfer():
+            s3_client.upload_file(
+                local_path, bucket_name, s3_key, Config=_SINGLE_THREAD_TRANSFER
+            )
+            return os.path.getsize(local_path)
+
+        return transfer
+
+    return _run_transfers(make_transfer, items, max_workers, retries, backoff, stats)
+
+
+def download_many(
+    s3_client,
+    bucket_name,
+    items: Iterable[Tuple[str, str]],
+    max_workers=16,
+    retries=3,
+    backoff=1.0,
+    stats: Optional[TransferStats] = None,
+) -> Iterator[TransferResult]:
+    """
+    Download many objects concurrently over one shared client.
+
+    Same contract as `upload_many`; `items` are `(local_path, s3_key)` pairs
+    and parent folders of `local_path` are created as needed.
+    """
+
+    def make_transfer(local_path, s3_key):
+        def transfer():
+            os.makedirs(os.path.dirname(local_path) or ".", exist_ok=True)
+            s3_client.download_file(
+                bucket_name, s3_key, local_path, Config=_SINGLE_THREAD_TRANSFER
+            )
+            return os.path.getsize(local_path)
+
+        return transfer
+
+    return _run_transfers(make_transfer, items, max_workers, retries, backoff, stats)
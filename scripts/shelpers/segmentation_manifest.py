@@ -0,0 +1,129 @@
+import os
+import json
+import time
+import threading
+from collections import Counter
+from loguru import logger
+
+DONE = "done"
+FAILED = "failed"
+
+
+class SegmentationManifest:
+    """
+    Record of the segmentation of every source audio.
+
+    One entry per source key holds the ETag of the source that was segmented,
+    the segmentation parameters, the produced segment keys and the status of
+    the run, so that a rerun only redoes the sources whose content or
+    parameters changed and the ones that failed.
+    """
+
+    def __init__(self, path, entries=None):
+        self.path = path
+        self.entries = entries if entries is not None else {}
+        self._lock = threading.Lock()
+        self._unsaved = 0
+
+    @classmethod
+    def load(cls, path, s3_client=None, bucket_name=None, s3_key=None):
+        """Loads the local manifest, or its S3 copy when there is no local one."""
+        if not os.path.exists(path) and s3_client is not None and s3_key:
+            try:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                s3_client.download_file(bucket_name, s3_key, path)
+                logger.info(f"Downloaded segmentation manifest s3://{bucket_name}/{s3_key}")
+            except Exception as e:
+                logger.info(f"No segmentation manifest on S3 ({e}), starting from scratch")
+        if not os.path.exists(path):
+            return cls(path)
+        with open(path, encoding="utf-8") as f:
+            return cls(path, json.load(f)["sources"])
+
+    def __len__(self):
+        return len(self.entries)
+
+    def pending_reason(self, s3_key, etag, params):
+        """
+        Returns why a source has to be segmented ("new", "changed", "params",
+        "failed"), or None when its last run is still valid.
+        """
+        entry = self.entries.get(s3_key)
+        if entry is None:
+            return "new"
+        if entry["etag"] != etag:
+            return "changed"
+        if entry["params"] != params:
+            return "params"
+        if entry["status"] != DONE:
+            return "failed"
+        return None
+
+    def plan(self, objects, params):
+        """
+        Splits listed source objects into the keys to process and the skipped ones.
+
+        Parameters:
+        - objects: Records of `list_s3_objects` (key, etag, ...).
+        - params: Segmentation parameters of this run.
+
+        Returns:
+        - (pending keys, Counter of the reasons, number of skipped sources)
+        """
+        pending, reasons, skipped = [], Counter(), 0
+        for obj in objects:
+            reason = self.pending_reason(obj["key"], obj["etag"], params)
+            if reason is None:
+                skipped += 1
+            else:
+                pending.append(obj["key"])
+                reasons[reason] += 1
+        return pending, reasons, skipped
+
+    def segment_keys(self, s3_key):
+        entry = self.entries.get(s3_key)
+        return entry["segments"] if entry else []
+
+    def record(self, s3_key, etag, params, segment_keys, status, error=None, save_every=10):
+        """Records the outcome of a source. Thread-safe; saved every `save_every` records."""
+        with self._lock:
+            self.entries[s3_key] = {
+                "etag": etag,
+                "params": params,
+                "segments": list(segment_keys),
+                "status": status,
+                "error": error,
+                "updated_at": time.time(),
+            }
+            self._unsaved += 1
+            if self._unsaved >= save_every:
+                self._save()
+
+    def statuses(self):
+        return Counter(entry["status"] for entry in self.entries.values())
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"sources": self.entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self._unsaved = 0
+
+    def save(self, s3_client=None, bucket_name=None, s3_key=None):
+        """Writes the manifest atomically, and mirrors it to S3 when `s3_key` is given."""
+        with self._lock:
+            self._save()
+        if s3_client is not None and s3_key:
+            s3_client.upload_file(self.path, bucket_name, s3_key)
+
+
+def delete_s3_keys(s3_client, bucket_name, keys):
+    """Deletes keys with `delete_objects`, 1000 at a time. Returns the number deleted."""
+    keys = list(keys)
+    for start in range(0, len(keys), 1000):
+        s3_client.delete_objects(
+            Bucket=bucket_name,
+            Delete={"Objects": [{"Key": key} for key in keys[start : start + 1000]], "Quiet": True},
+        )
+    return len(keys)
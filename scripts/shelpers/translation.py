@@ -0,0 +1,164 @@
+import re
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from loguru import logger
+
+from .llm_cache import ResponseCache
+from .rate_limiter import RETRYABLE_ERRORS, RateLimiter, retry_after
+
+PACKED_TRANSLATION_PROMPT = """Tu es un traducteur de texte en anglais en français d'afrique occidentale.
+Tu dois juste donner les traductions. Chaque texte est entre des balises numérotées <1>...</1>, <2>...</2>, etc.
+Réponds avec la traduction de chaque texte entre la même balise numérotée, dans le même ordre, sans rien d'autre.
+
+<example>
+User query:
+<1>Hello</1>
+<2>a</2>
+Your answer:
+<1>Salut</1>
+<2>un</2>
+</example>
+"""
+
+_TAG_PATTERN = re.compile(r"<(\d+)>(.*?)</\1>", re.DOTALL)
+
+
+def pack_texts(texts):
+    """Numbers the texts with tags, `<1>text</1>` one per line."""
+    return "\n".join(f"<{i}>{text}</{i}>" for i, text in enumerate(texts, 1))
+
+
+def unpack_translations(output, n_texts):
+    """Returns the translations of a packed answer, None for the missing numbers."""
+    found = {int(number): text.strip() for number, text in _TAG_PATTERN.findall(output)}
+    return [found.get(i) or None for i in range(1, n_texts + 1)]
+
+
+def make_batches(texts, max_texts=25, max_chars=4000):
+    """Groups texts into requests of at most `max_texts` texts and about `max_chars` characters."""
+    batches, batch, chars = [], [], 0
+    for text in texts:
+        if batch and (len(batch) == max_texts or chars + len(text) > max_chars):
+            batches.append(batch)
+            batch, chars = [], 0
+        batch.append(text)
+        chars += len(text)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def translate_batch(
+    client, texts, model, system_prompt, limiter=None, max_retries=6, base_delay=1.0
+):
+    """
+    Translates texts packed in one request, with backoff on 429 and transient errors.
+
+    Returns:
+    - Translations aligned with `texts`, None for the ones missing from the answer.
+    """
+    content = pack_texts(texts)
+    for attempt in range(max_retries):
+        if limiter is not None:
+            limiter.acquire(len(system_prompt) // 4 + 2 * len(content) // 4)
+        try:
+            response = client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": content},
+                ],
+                temperature=1,
+                top_p=1,
+            )
+            return unpack_translations(response.choices[0].message.content, len(texts))
+        except RETRYABLE_ERRORS as e:
+            if attempt == max_retries - 1:
+                raise
+            delay = retry_after(e) or base_delay * 2**attempt + random.uniform(0, base_delay)
+            if limiter is not None:
+                limiter.pause(delay)
+            logger.warning(f"{type(e).__name__}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def translate_texts(
+    texts,
+    client,
+    model="gpt-4o-mini",
+    system_prompt=PACKED_TRANSLATION_PROMPT,
+    cache=None,
+    max_texts=25,
+    max_chars=4000,
+    max_workers=8,
+    requests_per_minute=500,
+    tokens_per_minute=None,
+):
+    """
+    Translates a column of texts with as few requests as possible.
+
+    Identical texts are translated once, cached translations are reused,
+    and the remaining texts are packed into numbered requests sent
+    concurrently under a shared rate limit. Texts a packed answer missed
+    are sent again one per request; if that fails too, the source text is
+    kept, like `translate_to_west_african_french` does.
+
+    Parameters:
+    - texts: Source texts.
+    - client: OpenAI client, shared by every thread.
+    - cache: Optional ResponseCache keyed by text, prompt and model.
+    - max_texts, max_chars: Size of a packed request.
+    - max_workers: Requests in flight.
+
+    Returns:
+    - Translations aligned with `texts`.
+    """
+    unique = list(dict.fromkeys(texts))
+    translations = {}
+    keys = {text: ResponseCache.make_key(text, system_prompt, model) for text in unique}
+    if cache is not None:
+        for text in unique:
+            translation = cache.get(keys[text])
+            if translation is not None:
+                translations[text] = translation
+    todo = [text for text in unique if text not in translations]
+    logger.info(
+        f"{len(texts)} texts, {len(unique)} unique, {len(unique) - len(todo)} cached, "
+        f"{len(todo)} to translate"
+    )
+
+    limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+
+    def run(batches):
+        missed = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(translate_batch, client, batch, model, system_prompt, limiter): batch
+                for batch in batches
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                batch = futures[future]
+                try:
+                    results = future.result()
+                except Exception as e:
+                    logger.error(f"Translation request failed: {e}")
+                    results = [None] * len(batch)
+                for text, translation in zip(batch, results):
+                    if translation is None:
+                        missed.append(text)
+                        continue
+                    translations[text] = translation
+                    if cache is not None:
+                        cache.put(keys[text], translation)
+                if done % 50 == 0:
+                    logger.info(f"{done}/{len(batches)} translation requests done")
+        return missed
+
+    missed = run(make_batches(todo, max_texts, max_chars))
+    if missed:
+        logger.warning(f"{len(missed)} texts missing from packed answers, translating them alone")
+        missed = run([[text] for text in missed])
+    if missed:
+        logger.warning(f"{len(missed)} texts left untranslated")
+    return [translations.get(text, text) for text in texts]
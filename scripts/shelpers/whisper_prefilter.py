@@ -0,0 +1,81 @@
+import base64
+from rapidfuzz import fuzz, process
+
+from .audio_utils import decode_audio
+
+
+class WhisperPrefilter:
+    """
+    Local Whisper pass that settles the easy segments before `chat_with_audio`.
+
+    The segments of a page are transcribed in batches on the CPU, each
+    hypothesis is scored against the eligible candidates with rapidfuzz, and
+    only the segments whose best score is under `threshold` are escalated to
+    the hosted audio model.
+
+    Parameters:
+    - model_name: Whisper checkpoint, e.g. "small".
+    - threshold: Minimum `fuzz.ratio` of the best candidate to accept it locally.
+    - language: Decoding language, None to let Whisper detect it.
+    - device: Torch device of the model.
+    - batch_size: Segments decoded together.
+    """
+
+    def __init__(self, model_name="small", threshold=80, language=None, device="cpu", batch_size=8):
+        # Whisper (and torch) are only installed in the Docker image.
+        import torch
+        import whisper
+
+        self._torch = torch
+        self._whisper = whisper
+        self.model = whisper.load_model(model_name, device=device)
+        self.threshold = threshold
+        self.batch_size = batch_size
+        self.options = whisper.DecodingOptions(
+            language=language, without_timestamps=True, fp16=device != "cpu"
+        )
+        self.accepted = 0
+        self.escalated = 0
+
+    def transcribe_many(self, audios_base64):
+        """Returns the Whisper hypothesis of every base64 audio, in order."""
+        whisper = self._whisper
+        hypotheses = []
+        for start in range(0, len(audios_base64), self.batch_size):
+            mels = self._torch.stack(
+                [
+                    whisper.log_mel_spectrogram(
+                        whisper.pad_or_trim(
+                            self._torch.from_numpy(decode_audio(base64.b64decode(audio)))
+                        ),
+                        n_mels=self.model.dims.n_mels,
+                    )
+                    for audio in audios_base64[start : start + self.batch_size]
+                ]
+            ).to(self.model.device)
+            results = whisper.decode(self.model, mels, self.options)
+            hypotheses.extend(result.text.strip() for result in results)
+        return hypotheses
+
+    def match(self, hypothesis, candidates):
+        """
+        Returns the candidate matching a hypothesis, or None when the segment
+        has to be escalated to the audio model.
+        """
+        best = process.extractOne(hypothesis, candidates, scorer=fuzz.ratio) if hypothesis else None
+        if best is not None and best[1] >= self.threshold:
+            self.accepted += 1
+            return best[0]
+        self.escalated += 1
+        return None
+
+    @property
+    def escalation_rate(self):
+        total = self.accepted + self.escalated
+        return self.escalated / total if total else 0.0
+
+    def summary(self):
+        return (
+            f"Whisper prefilter: {self.accepted} matched locally, {self.escalated} escalated "
+            f"({self.escalation_rate:.1%} escalation rate)"
+        )
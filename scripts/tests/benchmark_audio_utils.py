@@ -0,0 +1,63 @@
+"""
+Timings of the silence parameter sweep against the pydub loop.
+
+    python tests/benchmark_audio_utils.py [audio.mp3]
+
+Without an audio file (decoding one needs ffmpeg), one minute of synthetic
+mono speech-like bursts is generated.
+"""
+import sys
+import time
+import os
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", RuntimeWarning)
+    from pydub import AudioSegment, silence  # noqa: E402
+
+from shelpers.audio_utils import detect_silence, energy_envelope, sweep_segment_counts  # noqa: E402
+from test_audio_utils import synthetic_audio  # noqa: E402
+
+MIN_SILENCE_LENS = [300, 500, 700, 1000]
+SILENCE_THRESHS = [-45, -40, -35, -30]
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"{label:<40} {time.perf_counter() - start:.3f}s")
+    return result
+
+
+def pydub_sweep(audio):
+    return {
+        (window, thresh): len(
+            silence.detect_silence(
+                audio, min_silence_len=window, silence_thresh=thresh, seek_step=1
+            )
+        )
+        for window in MIN_SILENCE_LENS
+        for thresh in SILENCE_THRESHS
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        audio = AudioSegment.from_file(sys.argv[1])
+    else:
+        audio = synthetic_audio(1, seconds=60)
+    grid = len(MIN_SILENCE_LENS) * len(SILENCE_THRESHS)
+    print(f"{len(audio) / 1000:.0f}s of audio, {grid} parameter pairs")
+    envelope = timed("energy_envelope", lambda: energy_envelope(audio))
+    timed(
+        "detect_silence (one pair)",
+        lambda: detect_silence(envelope, MIN_SILENCE_LENS[0], SILENCE_THRESHS[0]),
+    )
+    counts = timed(
+        "sweep_segment_counts",
+        lambda: sweep_segment_counts(envelope, MIN_SILENCE_LENS, SILENCE_THRESHS),
+    )
+    expected = timed("pydub detect_silence loop", lambda: pydub_sweep(audio))
+    print(f"same counts: {counts == expected}")
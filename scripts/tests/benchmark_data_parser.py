@@ -0,0 +1,51 @@
+"""
+Timings of the column cleaning against the per-row functions.
+
+    python tests/benchmark_data_parser.py [verses.parquet]
+
+Without a parquet file (with a `verse_text` column), a 50k-row corpus of
+verse-like strings is generated.
+"""
+import sys
+import time
+import random
+import os
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shelpers.data_parser import clean_text, clean_text_column, clean_verse_column  # noqa: E402
+
+
+def synthetic_verses(n=50_000, seed=0):
+    rng = random.Random(seed)
+    words = ["Wẽnnaam", "yeelame", "ne", "a", "ninsaal", "+", "*", "*+;", "+.", '"', "“", "”"]
+    return pd.Series(
+        [
+            f"{i % 40 + 1} " + " ".join(rng.choice(words) for _ in range(rng.randint(8, 30)))
+            for i in range(n)
+        ]
+    )
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    func()
+    print(f"{label:<40} {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        verses = pd.read_parquet(sys.argv[1], columns=["verse_text"])["verse_text"]
+    else:
+        verses = synthetic_verses()
+    print(f"{len(verses)} verses")
+    timed("apply(clean_text)", lambda: verses.apply(clean_text))
+    timed("clean_text_column", lambda: clean_text_column(verses))
+    try:
+        from jwsoup.text.utils import clean_text as jwsoup_clean_text
+    except ImportError:
+        sys.exit(0)
+    timed("map(jwsoup clean_text)", lambda: verses.map(jwsoup_clean_text))
+    timed("clean_verse_column", lambda: clean_verse_column(verses))
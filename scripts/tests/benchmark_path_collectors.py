@@ -0,0 +1,52 @@
+"""
+Timings of the page -> segments lookups of a chapter listing.
+
+    python tests/benchmark_path_collectors.py [n_keys]
+
+A synthetic listing of `n_keys` segment keys (100k by default, 50 segments
+per page) is looked up page by page, with a SegmentIndex and with the
+substring scan of `get_page_segments` on the plain list.
+"""
+import sys
+import time
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shelpers.path_collectors import SegmentIndex, get_page_segments  # noqa: E402
+from test_path_collectors import chapter_listing  # noqa: E402
+
+SEGMENTS_PER_PAGE = 50
+# The substring scan is O(keys) per page: it is timed on a sample of pages.
+SCANNED_PAGES = 20
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed:.3f}s")
+    return result, elapsed
+
+
+if __name__ == "__main__":
+    n_keys = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    n_pages = n_keys // SEGMENTS_PER_PAGE
+    files = chapter_listing(range(1, n_pages + 1), SEGMENTS_PER_PAGE)
+    print(f"{len(files)} keys, {n_pages} pages")
+
+    index, _ = timed("SegmentIndex(files)", lambda: SegmentIndex(files))
+    timed(
+        f"index lookups ({n_pages} pages)",
+        lambda: [index.page_segments(page) for page in range(1, n_pages + 1)],
+    )
+    sample = range(1, min(SCANNED_PAGES, n_pages) + 1)
+    _, elapsed = timed(
+        f"substring scan ({len(sample)} pages)",
+        lambda: [get_page_segments(page, files) for page in sample],
+    )
+    print(f"{'substring scan (all pages, projected)':<40} {elapsed / len(sample) * n_pages:.1f}s")
+    print(
+        "same segments:",
+        all(index.page_segments(page) == get_page_segments(page, files) for page in sample),
+    )
@@ -0,0 +1,60 @@
+import io
+import time
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("rapidfuzz")
+
+from shelpers.async_pipeline import process_page_async
+from shelpers.rate_limiter import AsyncRateLimiter
+
+
+class SlowS3Client:
+    """Segment bodies that take a while to download, so a prefetch is still running."""
+
+    def __init__(self):
+        self.downloads = 0
+
+    def get_object(self, Bucket, Key):
+        time.sleep(0.05)
+        self.downloads += 1
+        body = io.BytesIO(b"mp3")
+        body.iter_chunks = lambda: iter([body.getvalue()])
+        return {"Body": body}
+
+
+class FailingChatClient:
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **request):
+        raise ValueError("invalid request")
+
+
+def test_api_error_leaves_no_prefetch_behind():
+    files = [f"mp3/Matiyu 1/page_1/segment_{segment}.mp3" for segment in range(1, 12)]
+    unretrieved = []
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        loop.set_exception_handler(lambda loop, context: unretrieved.append(context))
+        with pytest.raises(ValueError):
+            await process_page_async(
+                1,
+                {1: ["verse"]},
+                files,
+                FailingChatClient(),
+                SlowS3Client(),
+                "bucket",
+                "model",
+                "prompt",
+                asyncio.Semaphore(4),
+                AsyncRateLimiter(600),
+            )
+        return [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+    assert asyncio.run(run()) == []
+    assert unretrieved == []
@@ -0,0 +1,65 @@
+import warnings
+
+import numpy as np
+import pytest
+
+with warnings.catch_warnings():
+    # pydub warns when ffmpeg is missing; building segments from raw PCM needs none.
+    warnings.simplefilter("ignore", RuntimeWarning)
+    from pydub import AudioSegment, silence
+
+from shelpers.audio_utils import detect_silence, energy_envelope, sweep_segment_counts
+
+FRAME_RATE = 16000
+PARAMETERS = [(300, -40), (500, -30), (700, -35), (1000, -16)]
+
+
+def synthetic_audio(channels, seconds=12, seed=0):
+    """Tone and noise bursts separated by quiet gaps of 100 ms to 1.5 s."""
+    rng = np.random.default_rng(seed)
+    samples = rng.normal(0, 30, (seconds * FRAME_RATE, channels))
+    position = 0
+    while position < len(samples):
+        burst = int(rng.uniform(0.2, 1.5) * FRAME_RATE)
+        t = np.arange(min(burst, len(samples) - position)) / FRAME_RATE
+        loudness = rng.uniform(1000, 12000)
+        tone = loudness * np.sin(2 * np.pi * rng.uniform(100, 800) * t)
+        samples[position : position + len(t)] += (
+            tone[:, None] + rng.normal(0, loudness / 4, (len(t), channels))
+        )
+        position += burst + int(rng.uniform(0.1, 1.5) * FRAME_RATE)
+    pcm = np.clip(samples, -32768, 32767).astype(np.int16)
+    return AudioSegment(pcm.tobytes(), frame_rate=FRAME_RATE, sample_width=2, channels=channels)
+
+
+@pytest.fixture(scope="module", params=[1, 2], ids=["mono", "stereo"])
+def audio(request):
+    return synthetic_audio(request.param)
+
+
+@pytest.mark.parametrize("min_silence_len,silence_thresh", PARAMETERS)
+def test_detect_silence_matches_pydub(audio, min_silence_len, silence_thresh):
+    expected = silence.detect_silence(
+        audio, min_silence_len=min_silence_len, silence_thresh=silence_thresh, seek_step=1
+    )
+    assert expected, "the synthetic audio should contain silences"
+    assert detect_silence(energy_envelope(audio), min_silence_len, silence_thresh) == expected
+
+
+def test_sweep_counts_match_detect_silence(audio):
+    envelope = energy_envelope(audio)
+    windows = sorted({window for window, _ in PARAMETERS})
+    threshs = sorted({thresh for _, thresh in PARAMETERS})
+    counts = sweep_segment_counts(envelope, windows, threshs)
+    for window in windows:
+        for thresh in threshs:
+            expected = silence.detect_silence(
+                audio, min_silence_len=window, silence_thresh=thresh, seek_step=1
+            )
+            assert counts[(window, thresh)] == len(expected)
+
+
+def test_audio_shorter_than_the_window_has_no_silence():
+    audio = synthetic_audio(1, seconds=1)
+    assert detect_silence(energy_envelope(audio), 2000, -16) == []
+    assert sweep_segment_counts(energy_envelope(audio), [2000], [-16]) == {(2000, -16): 0}
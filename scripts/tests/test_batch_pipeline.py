@@ -0,0 +1,57 @@
+import io
+
+import pytest
+
+pytest.importorskip("rapidfuzz")
+
+from shelpers.batch_pipeline import process_pages_batch
+from test_batch_utils import FakeBatchClient
+
+
+class FakeS3Client:
+    """Serves segment bodies from a dict; keys missing from it fail like a missing object."""
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.uploaded = []
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise KeyError(f"NoSuchKey: {Key}")
+        body = io.BytesIO(self.objects[Key])
+        body.iter_chunks = lambda: iter([body.getvalue()])
+        return {"Body": body}
+
+    def upload_file(self, local_path, bucket_name, s3_key):
+        self.uploaded.append(s3_key)
+
+
+def segments(page, count):
+    return [f"mp3/Matiyu 1/page_{page}/segment_{segment}.mp3" for segment in range(1, count + 1)]
+
+
+def test_unreadable_segment_only_fails_its_page(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    files = segments(1, 9) + segments(2, 9)
+    # Page 2 loses its first matched segment (segments 1-6 are the introduction).
+    missing = "mp3/Matiyu 1/page_2/segment_7.mp3"
+    s3_client = FakeS3Client({file: b"mp3" for file in files if file != missing})
+    client = FakeBatchClient(lambda body: "<output>verse</output><grade>1</grade>")
+    candidates = {1: ["verse"], 2: ["verse"], 3: ["verse"]}
+
+    results = process_pages_batch(
+        [(page, candidates, files) for page in (1, 2, 3)],
+        client,
+        s3_client,
+        "bucket",
+        "model",
+        "prompt",
+        tmp_path / "batches",
+        poll_interval=0,
+    )
+
+    # Page 3 has no segments and is not a failure.
+    assert set(results) == {("Matiyu 1", 1), ("Matiyu 1", 2)}
+    assert [record["audio_path"] for record in results[("Matiyu 1", 1)]] == segments(1, 9)[6:]
+    assert results[("Matiyu 1", 2)] is None
+    assert "model_transcription/aggregated/Matiyu 1/1_final_batch.json" in s3_client.uploaded
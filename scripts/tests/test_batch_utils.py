@@ -0,0 +1,104 @@
+import io
+import json
+from types import SimpleNamespace
+
+from shelpers.batch_utils import run_batch
+
+
+class FakeBatchClient:
+    """
+    In-memory stand-in for the `files` and `batches` endpoints of the OpenAI client.
+
+    A batch is "validating" (without request counts) on its first poll and
+    completes on the next one; each request is answered by `respond(body)`,
+    which returns the content or raises to make the request fail.
+    """
+
+    def __init__(self, respond, fail_validation=False):
+        self.respond = respond
+        self.fail_validation = fail_validation
+        self.uploaded, self.contents, self.states = {}, {}, {}
+        self.files = SimpleNamespace(create=self._create_file, content=self._content)
+        self.batches = SimpleNamespace(create=self._create_batch, retrieve=self._retrieve)
+
+    def _create_file(self, file, purpose):
+        file_id = f"file-{len(self.uploaded)}"
+        self.uploaded[file_id] = file.read().decode("utf-8")
+        return SimpleNamespace(id=file_id)
+
+    def _content(self, file_id):
+        return SimpleNamespace(text=self.contents[file_id])
+
+    def _create_batch(self, input_file_id, endpoint, completion_window, metadata):
+        batch_id = f"batch-{len(self.states)}"
+        self.states[batch_id] = {"input": input_file_id, "polls": 0}
+        return SimpleNamespace(id=batch_id)
+
+    def _retrieve(self, batch_id):
+        state = self.states[batch_id]
+        state["polls"] += 1
+        if state["polls"] == 1:
+            return SimpleNamespace(id=batch_id, status="validating", request_counts=None)
+        if self.fail_validation:
+            return SimpleNamespace(
+                id=batch_id,
+                status="failed",
+                request_counts=None,
+                output_file_id=None,
+                error_file_id=None,
+            )
+
+        output, errors, completed = io.StringIO(), io.StringIO(), 0
+        for line in self.uploaded[state["input"]].splitlines():
+            request = json.loads(line)
+            try:
+                content = self.respond(request["body"])
+            except Exception as e:
+                item = {"custom_id": request["custom_id"], "response": None, "error": str(e)}
+                errors.write(json.dumps(item) + "\n")
+                continue
+            body = {"choices": [{"message": {"content": content}}]}
+            response = {"status_code": 200, "body": body}
+            item = {"custom_id": request["custom_id"], "response": response}
+            output.write(json.dumps(item) + "\n")
+            completed += 1
+        self.contents[f"{batch_id}-output"] = output.getvalue()
+        self.contents[f"{batch_id}-errors"] = errors.getvalue()
+        total = len(self.uploaded[state["input"]].splitlines())
+        return SimpleNamespace(
+            id=batch_id,
+            status="completed",
+            request_counts=SimpleNamespace(completed=completed, failed=total - completed),
+            output_file_id=f"{batch_id}-output",
+            error_file_id=f"{batch_id}-errors",
+        )
+
+
+def respond(body):
+    text = body["messages"][0]["content"]
+    if text == "boom":
+        raise ValueError("invalid request")
+    return text.upper()
+
+
+def requests(*texts):
+    return {
+        f"id-{i}": {"messages": [{"role": "user", "content": text}]}
+        for i, text in enumerate(texts)
+    }
+
+
+def test_run_batch_maps_answers_and_failures(tmp_path):
+    client = FakeBatchClient(respond)
+
+    results = run_batch(client, requests("a", "boom", "c"), str(tmp_path), "test", poll_interval=0)
+
+    assert results == {"id-0": "A", "id-1": None, "id-2": "C"}
+
+
+def test_run_batch_survives_batches_without_request_counts(tmp_path):
+    client = FakeBatchClient(respond, fail_validation=True)
+
+    results = run_batch(client, requests("a", "b"), str(tmp_path), "test", poll_interval=0)
+
+    assert results == {"id-0": None, "id-1": None}
@@ -0,0 +1,69 @@
+import random
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from shelpers.data_parser import (
+    clean_text,
+    clean_text_column,
+    clean_verse_column,
+    flatten_nested_values,
+    page_candidates,
+    splitter,
+)
+
+# Every character the cleaning steps treat specially, plus non-ASCII
+# whitespace and digits that Python's \s, \d and strip() cover but RE2's do not.
+ALPHABET = list('ab ,;:.+*"“”0123456789') + [
+    "\t", "\n", "\x0b", "\x1c", "\x85", " ", " ", "　", "​", "٣", "é", "ɩ",
+]
+
+
+def random_texts(n, max_length=40, seed=0):
+    rng = random.Random(seed)
+    return [
+        "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, max_length)))
+        for _ in range(n)
+    ]
+
+
+def test_clean_text_column_matches_clean_text():
+    texts = pd.Series(random_texts(100_000), index=range(5, 100_005), name="verse_text")
+
+    cleaned = clean_text_column(texts)
+
+    pd.testing.assert_series_equal(cleaned, texts.apply(clean_text))
+
+
+def test_clean_text_column_keeps_missing_values_and_arrow_input():
+    cleaned = clean_text_column(pd.Series([' "a + b" ', None]))
+    assert cleaned[0] == "a b"
+    assert cleaned.isna()[1]
+
+    assert clean_text_column(pa.array(["* + x"])).to_pylist() == ["x"]
+
+
+def test_clean_verse_column_matches_jwsoup():
+    utils = pytest.importorskip("jwsoup.text.utils")
+    texts = pd.Series(random_texts(100_000, seed=1))
+
+    pd.testing.assert_series_equal(clean_verse_column(texts), texts.map(utils.clean_text))
+
+
+def test_page_candidates_match_splitter():
+    rng = random.Random(2)
+    texts = random_texts(20_000, max_length=60, seed=2)
+    df = pd.DataFrame(
+        {
+            "chapter": [f"chapter {rng.randint(0, 9)}" for _ in texts],
+            "page": [rng.randint(1, 20) for _ in texts],
+            "moore_verse_text": texts,
+        }
+    )
+
+    candidates = page_candidates(df, ["chapter", "page"])
+
+    for (chapter, page), verses in df.groupby(["chapter", "page"], sort=False):
+        expected = flatten_nested_values(verses["moore_verse_text"].apply(splitter))
+        assert candidates[(chapter, page)] == expected
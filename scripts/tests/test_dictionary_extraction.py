@@ -0,0 +1,37 @@
+import json
+from types import SimpleNamespace
+
+from shelpers import dictionary_extraction
+
+
+class FakeChatClient:
+    """Answers every page with one entry naming the prompt it was sent."""
+
+    def __init__(self, *args, **kwargs):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, max_tokens):
+        instruction = messages[0]["content"][0]["text"]
+        content = f'<output>[{{"prompt": "{instruction}"}}]</output>'
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def test_main_extracts_every_page_with_the_job_prompt(tmp_path, monkeypatch):
+    monkeypatch.setattr(dictionary_extraction, "OpenAI", FakeChatClient)
+    images = tmp_path / "images"
+    images.mkdir()
+    for page in (1, 2):
+        (images / f"page_{page}.jpg").write_bytes(b"jpeg")
+    output = tmp_path / "vocabulary.json"
+
+    dictionary_extraction.main(
+        "Extract", {"folder_path": str(images), "output_json_path": str(output)}, argv=[]
+    )
+
+    with open(output, encoding="utf_8") as f:
+        assert json.load(f) == [[{"prompt": "Extract"}]] * 2
+    assert len(list(tmp_path.glob("vocabulary.json.pages/*.json"))) == 2
+
+
+def test_unparsable_output_is_none():
+    assert dictionary_extraction.parse_llm_output("no tag", "page_1.jpg") is None
@@ -0,0 +1,38 @@
+import json
+
+import pytest
+from openai import AuthenticationError, RateLimitError
+
+from shelpers.extraction_runner import page_result_path, run_page_extraction
+
+
+def api_error(cls):
+    # The status errors want an HTTP response; the runner only looks at the type.
+    return cls.__new__(cls)
+
+
+def test_transient_errors_and_unparsable_output_are_retried(tmp_path):
+    answers = {"a.jpg": [api_error(RateLimitError), None, ["entry"]]}
+
+    def extract(page):
+        answer = answers[page].pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    results = run_page_extraction(["a.jpg"], extract, tmp_path, retries=3, backoff=0)
+    assert results == [["entry"]]
+    with open(page_result_path(tmp_path, "a.jpg"), encoding="utf_8") as f:
+        assert json.load(f) == ["entry"]
+
+
+def test_permanent_errors_are_raised_without_retry(tmp_path):
+    calls = []
+
+    def extract(page):
+        calls.append(page)
+        raise api_error(AuthenticationError)
+
+    with pytest.raises(AuthenticationError):
+        run_page_extraction(["a.jpg"], extract, tmp_path, retries=3, backoff=0)
+    assert calls == ["a.jpg"]
@@ -0,0 +1,121 @@
+import os
+
+import pandas as pd
+
+from shelpers.dataset_builder import Source, build_dataset, push_partitions
+from shelpers.hub_delta import DELTA_SHARD_PATTERN, LocalRepo, append_rows
+
+
+def rows(*pairs, source="masakhane"):
+    return pd.DataFrame(
+        {
+            "french": [french for french, _ in pairs],
+            "moore": [moore for _, moore in pairs],
+            "source": source,
+        }
+    )
+
+
+def read_repo(repo):
+    shards = sorted(path for path in repo.list_files() if path.startswith("data/"))
+    return pd.concat(
+        [pd.read_parquet(os.path.join(repo.root, path)) for path in shards], ignore_index=True
+    )
+
+
+def delta_shards(repo):
+    return [path for path in repo.list_files() if DELTA_SHARD_PATTERN.match(path)]
+
+
+def test_append_rows_only_adds_new_rows(tmp_path):
+    repo = LocalRepo(str(tmp_path / "repo"))
+
+    incoming = rows(("a", "A"), ("b", "B"), ("a", "A"))
+    assert append_rows(repo, incoming, str(tmp_path / "w1"), "1") == 2
+    assert append_rows(repo, rows(("b", "B"), ("c", "C")), str(tmp_path / "w2"), "2") == 1
+    assert append_rows(repo, rows(("c", "C")), str(tmp_path / "w3"), "3") == 0
+
+    assert sorted(read_repo(repo)["french"]) == ["a", "b", "c"]
+    # Two appends within the same second get distinct shards, each with its hash index.
+    files = repo.list_files()
+    assert len(delta_shards(repo)) == 2
+    assert all(f"hash_index/{os.path.basename(path)}" in files for path in delta_shards(repo))
+
+
+def test_push_partitions_absorbs_the_delta_shards(tmp_path):
+    repo = LocalRepo(str(tmp_path / "repo"))
+    append_rows(repo, rows(("a", "A"), ("b", "B")), str(tmp_path / "w1"), "append")
+    append_rows(repo, rows(("z", "Z")), str(tmp_path / "w2"), "append")
+
+    # The rebuilt partition holds a, b (and c) but not z.
+    output_dir = str(tmp_path / "partitions")
+    partition = rows(("a", "A"), ("b", "B"), ("c", "C"))
+    build_dataset([Source("masakhane", lambda: "v1", lambda: partition)], output_dir)
+    assert push_partitions(output_dir, repo) == ["masakhane"]
+
+    data = read_repo(repo)
+    assert sorted(data["french"]) == ["a", "b", "c", "z"]
+    (delta,) = delta_shards(repo)
+    assert pd.read_parquet(os.path.join(repo.root, delta))["french"].tolist() == ["z"]
+
+    # Appending after the rebuild still skips the rows of the partition.
+    assert append_rows(repo, rows(("c", "C"), ("d", "D")), str(tmp_path / "w3"), "append") == 1
+    assert sorted(read_repo(repo)["french"]) == ["a", "b", "c", "d", "z"]
+
+
+def test_push_partitions_keeps_legacy_rows_not_in_the_partitions(tmp_path):
+    repo = LocalRepo(str(tmp_path / "repo"))
+    os.makedirs(os.path.join(repo.root, "data"))
+    rows(("a", "A"), ("old", "OLD")).to_parquet(
+        os.path.join(repo.root, "data/train-00000-of-00001.parquet"), index=False
+    )
+
+    output_dir = str(tmp_path / "partitions")
+    build_dataset([Source("bible", lambda: "v1", lambda: rows(("a", "A")))], output_dir)
+    push_partitions(output_dir, repo)
+
+    assert sorted(read_repo(repo)["french"]) == ["a", "old"]
+
+
+def test_push_partitions_absorbs_legacy_rows_with_an_old_source_label(tmp_path):
+    repo = LocalRepo(str(tmp_path / "repo"))
+    os.makedirs(os.path.join(repo.root, "data"))
+    legacy = pd.concat(
+        [rows(("a", "A"), ("b", "B"), source="jw.org"), rows(("m", "M"), source="masakhane-io")]
+    )
+    legacy.to_parquet(os.path.join(repo.root, "data/train-00000-of-00001.parquet"), index=False)
+
+    output_dir = str(tmp_path / "partitions")
+    partition = rows(("a", "A"), ("b", "B"), ("c", "C"), source="bible")
+    build_dataset([Source("bible", lambda: "v1", lambda: partition)], output_dir)
+    push_partitions(output_dir, repo)
+
+    data = read_repo(repo)
+    assert sorted(zip(data["french"], data["source"])) == [
+        ("a", "bible"),
+        ("b", "bible"),
+        ("c", "bible"),
+        ("m", "masakhane-io"),
+    ]
+
+
+def test_removed_partition_goes_with_its_hash_index(tmp_path):
+    repo = LocalRepo(str(tmp_path / "repo"))
+    output_dir = str(tmp_path / "partitions")
+    sources = [
+        Source("bible", lambda: "v1", lambda: rows(("a", "A"), source="bible")),
+        Source("smol", lambda: "v1", lambda: rows(("s", "S"), source="smol")),
+    ]
+    build_dataset(sources, output_dir)
+    push_partitions(output_dir, repo)
+    # Appending indexes the partitions, which writes their hash index sidecars.
+    append_rows(repo, rows(("d", "D")), str(tmp_path / "w1"), "append")
+    assert "hash_index/train-smol.parquet" in repo.list_files()
+
+    build_dataset(sources[:1], output_dir)
+    push_partitions(output_dir, repo)
+
+    files = repo.list_files()
+    assert "data/train-smol.parquet" not in files
+    assert "hash_index/train-smol.parquet" not in files
+    assert "hash_index/train-bible.parquet" in files
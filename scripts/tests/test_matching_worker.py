@@ -0,0 +1,33 @@
+import pytest
+
+pytest.importorskip("joblib")
+pytest.importorskip("openai")
+pytest.importorskip("rapidfuzz")
+
+from joblib.externals.loky import get_reusable_executor
+
+from shelpers.matching_worker import init_worker, page_inputs, process_page
+from shelpers.page_index import PageStore
+
+
+def test_loky_workers_share_the_initialised_store(tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    store = str(tmp_path / "pages.arrow")
+    PageStore.write(
+        store,
+        [("Matiyu 1", 1, ["a", "b"], ["mp3/Matiyu 1/page_1/segment_7.mp3"])]
+        + [("Matiyu 1", page, [], []) for page in range(2, 6)],
+    )
+    executor = get_reusable_executor(max_workers=2, initializer=init_worker, initargs=(store,))
+
+    candidates, files = executor.submit(page_inputs, "Matiyu 1", 1).result()
+    assert candidates == {1: ["a", "b"]}
+    assert files.page_segments(1) == ["mp3/Matiyu 1/page_1/segment_7.mp3"]
+
+    # Pages without segments go through `process_single_page` without any request.
+    futures = [
+        executor.submit(process_page, "Matiyu 1", page, "bucket", "model", "prompt", 50)
+        for page in range(2, 6)
+    ]
+    assert [future.result() for future in futures] == [[]] * 4
+    executor.shutdown()
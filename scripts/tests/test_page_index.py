@@ -0,0 +1,44 @@
+import pandas as pd
+
+from shelpers.page_index import PageIndex
+
+BASE_URL = "https://www.jw.org/mos/library/bible"
+
+
+def verses():
+    rows = [
+        ("Matiyu%201", 2, "a"),
+        ("Matiyu%201", 1, "b"),
+        ("Mark", 11, "c"),
+        ("Matiyu%201", 2, "d"),
+        ("Mark", 1, "e"),
+        ("Matiyu%201", 1, "f"),
+    ]
+    return pd.DataFrame(
+        {
+            "moore_source_url": [f"{BASE_URL}/{chapter}/{page}/" for chapter, page, _ in rows],
+            "moore_verse_text": [text for _, _, text in rows],
+        }
+    )
+
+
+def test_page_is_the_slice_of_its_verses():
+    index = PageIndex.build(verses())
+    assert len(index) == 4
+    assert index.keys() == [("Mark", 1), ("Mark", 11), ("Matiyu 1", 1), ("Matiyu 1", 2)]
+    for chapter, page_num in index.keys():
+        data = index.data
+        expected = data[(data["chapter"] == chapter) & (data["page"] == page_num)]
+        assert index.page(chapter, page_num).equals(expected)
+    # The verses of a page keep their dataset order.
+    assert index.page("Matiyu 1", 1)["moore_verse_text"].tolist() == ["b", "f"]
+    assert index.page("Matiyu 1", 3).empty
+
+
+def test_saved_index_keeps_its_pages(tmp_path):
+    path = str(tmp_path / "page_index.parquet")
+    PageIndex.build(verses(), fingerprint="abc").save(path)
+    assert PageIndex.load(path, fingerprint="other") is None
+    index = PageIndex.load(path, fingerprint="abc")
+    assert index.fingerprint == "abc"
+    assert index.page("Mark", 11)["moore_verse_text"].tolist() == ["c"]
@@ -0,0 +1,65 @@
+import random
+
+from shelpers.path_collectors import (
+    INTRO_SEGMENT_NAMES,
+    INTRO_SEGMENTS_SKIPPED,
+    SegmentIndex,
+    get_page_segments,
+    parse_segment_key,
+)
+
+
+def substring_page_segments(page_num, files):
+    """`get_page_segments` on a plain listing: the substring scan the index replaces."""
+    return get_page_segments(page_num, list(files))
+
+
+def chapter_listing(pages, segments, chapter="Matiyu 1", seed=0):
+    keys = [
+        f"mp3/{chapter}/page_{page}/segment_{segment}.mp3"
+        for page in pages
+        for segment in range(1, segments + 1)
+    ]
+    random.Random(seed).shuffle(keys)
+    return keys
+
+
+def test_index_matches_the_substring_lookup():
+    files = chapter_listing(range(1, 25), 15)
+    index = SegmentIndex(files)
+    assert index.pages() == list(range(1, 25))
+    for page in range(0, 27):
+        assert index.page_segments(page) == substring_page_segments(page, files)
+        assert get_page_segments(page, index) == index.page_segments(page)
+
+
+def test_page_1_does_not_collect_page_11():
+    files = chapter_listing([1, 11, 111], 10)
+    index = SegmentIndex(files)
+    for page in (1, 11, 111):
+        segments = index.page_segments(page)
+        assert segments == substring_page_segments(page, files)
+        assert {parse_segment_key(key)[1] for key in segments} == {page}
+
+
+def test_intro_segments_are_skipped():
+    files = chapter_listing([3], 10)
+    kept = INTRO_SEGMENT_NAMES + INTRO_SEGMENTS_SKIPPED
+    assert SegmentIndex(files).page_segments(3) == [
+        f"mp3/Matiyu 1/page_3/segment_{segment}.mp3" for segment in range(kept + 1, 11)
+    ]
+    # A page with only introduction segments has none left.
+    assert SegmentIndex(chapter_listing([3], kept)).page_segments(3) == []
+
+
+def test_unparsable_keys_are_ignored():
+    unparsable = [
+        "mp3/Matiyu 1/page_2/segment_x.mp3",
+        "mp3/Matiyu 1/page_2/notes.txt",
+        "mp3/Matiyu 1/page_2/segment_9.wav",
+        "page_2/segment_9.mp3",
+    ]
+    for key in unparsable:
+        assert parse_segment_key(key) is None
+    files = chapter_listing([2], 10)
+    assert SegmentIndex(files + unparsable).page_segments(2) == substring_page_segments(2, files)
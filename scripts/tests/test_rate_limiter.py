@@ -0,0 +1,31 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("openai")
+
+from shelpers.rate_limiter import RateLimiter
+
+
+def test_pause_does_not_wait_for_a_sleeping_acquire():
+    limiter = RateLimiter(requests_per_minute=600)
+    limiter._requests = 0
+    waiter = threading.Thread(target=limiter.acquire)
+    start = time.monotonic()
+    waiter.start()
+    time.sleep(0.02)
+
+    limiter.pause(0.3)
+    assert time.monotonic() - start < 0.1
+    waiter.join()
+    # The pause applies to the thread already waiting for its turn.
+    assert time.monotonic() - start >= 0.3
+
+
+def test_concurrent_consume_loses_no_update():
+    limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=1_000_000)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(limiter.consume, [1] * 10_000))
+    assert limiter._tokens == 1_000_000 - 10_000